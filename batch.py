@@ -0,0 +1,159 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict
+
+from generation import (GUIDE_WRITER_PROMPT, build_guide_prompt, build_travel_context, generate_itinerary,
+                        generate_travel_guide)
+from llm import set_rate_limit
+from metrics import configure_logging
+from participants import validate_participant
+
+# Headless batch mode: one itinerary (and optionally one .docx guide) per trip spec, without Streamlit.
+# Each input line is a JSON trip spec, for example:
+# {"id": "smith", "countries": ["Thailand", "Laos"], "start_date": "2024-12-07", "end_date": "2025-01-07",
+#  "participants": [{"name": "Ann", "age": 34, "gender": "Female", "preference": "Culture"}], "notes": "No flights"}
+# Results are appended to the output JSONL as they finish; it doubles as the checkpoint, so rerunning
+# the same command after a crash only processes the specs that have not succeeded yet.
+
+DEFAULT_MODEL = "gpt-4"
+
+
+# Function to get the id of a spec, derived from its content when it does not have one
+def spec_id(spec):
+    if spec.get('id'):
+        return str(spec['id'])
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+# Function to read the trip specs, raises ValueError with the line number for invalid ones
+def read_specs(path):
+    specs = []
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                spec = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path}:{line_number}: invalid JSON ({e})")
+            missing = [key for key in ('countries', 'start_date', 'end_date', 'participants') if not spec.get(key)]
+            if missing:
+                raise ValueError(f"{path}:{line_number}: missing {', '.join(missing)}")
+            if not isinstance(spec['participants'], list):
+                raise ValueError(f"{path}:{line_number}: participants must be a list")
+            # Same rules as the participants table: only the name is required, the other fields get defaults
+            participants = []
+            for number, participant in enumerate(spec['participants'], start=1):
+                try:
+                    if not isinstance(participant, dict):
+                        raise ValueError("must be an object")
+                    participants.append(asdict(validate_participant(participant)))
+                except ValueError as e:
+                    raise ValueError(f"{path}:{line_number}: participant {number}: {e}")
+            spec['participants'] = participants
+            specs.append(spec)
+    return specs
+
+
+# Function to read the ids already finished in a previous run of the same output file
+def read_checkpoint(path):
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by a crash, the spec is simply run again
+                continue
+            if record.get('status') == 'done':
+                done.add(record['id'])
+    return done
+
+
+# Function to get a file name that is safe to write for a spec id
+def safe_file_name(name):
+    return re.sub(r'[^A-Za-z0-9._-]+', '_', name).strip('._') or 'trip'
+
+
+# Function to run one trip spec: itinerary, then the guide written to docx_dir
+def run_trip(spec, model, docx_dir, with_guide, use_cache):
+    trip_id = spec_id(spec)
+    countries = spec['countries']
+    travel_context = build_travel_context(spec['start_date'], spec['end_date'], countries, spec['participants'])
+    if spec.get('notes'):
+        travel_context += f"Notes from the travellers: {spec['notes']}\n"
+    messages = [{"role": "user", "content": travel_context}]
+
+    record = {'id': trip_id, 'status': 'done'}
+    record['itinerary'] = generate_itinerary(messages, spec.get('model') or model, countries, use_cache=use_cache)
+
+    if spec.get('guide', with_guide):
+        # A model failure fails the spec (it is retried on the next run) rather than ending up in the guide
+        path = os.path.join(docx_dir, f"{safe_file_name(trip_id)}.docx")
+        generate_travel_guide(GUIDE_WRITER_PROMPT, build_guide_prompt(countries, spec['participants']), path + '.tmp',
+                              raise_errors=True)
+        os.replace(path + '.tmp', path)
+        record['guide_path'] = path
+    return record
+
+
+# Function to run every spec concurrently and append each result to the output as soon as it is ready
+def run_batch(specs, output_path, docx_dir, model=DEFAULT_MODEL, concurrency=4, with_guide=True, use_cache=True):
+    done = read_checkpoint(output_path)
+    pending = [spec for spec in specs if spec_id(spec) not in done]
+    print(f"{len(specs)} trip specs, {len(specs) - len(pending)} already done, running {len(pending)}", file=sys.stderr)
+    if not pending:
+        return 0
+    os.makedirs(docx_dir, exist_ok=True)
+
+    failures = 0
+    lock = threading.Lock()
+    with open(output_path, 'a', encoding='utf-8') as output, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(run_trip, spec, model, docx_dir, with_guide, use_cache): spec_id(spec) for spec in pending}
+        for future in as_completed(futures):
+            try:
+                record = future.result()
+            except Exception as e:
+                record = {'id': futures[future], 'status': 'failed', 'error': f"{type(e).__name__}: {e}"}
+                failures += 1
+            with lock:
+                output.write(json.dumps(record, ensure_ascii=False) + '\n')
+                output.flush()
+                os.fsync(output.fileno())
+            print(f"{record['id']}: {record['status']}", file=sys.stderr)
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate itineraries and travel guides for a JSONL file of trip specs")
+    parser.add_argument('specs', help="JSONL file with one trip spec per line")
+    parser.add_argument('--output', default='batch_results.jsonl', help="JSONL results, also used as the checkpoint")
+    parser.add_argument('--docx-dir', default='guides', help="directory for the .docx travel guides")
+    parser.add_argument('--model', default=DEFAULT_MODEL, help="itinerary model when a spec does not set one")
+    parser.add_argument('--concurrency', type=int, default=4, help="trip specs processed at the same time")
+    parser.add_argument('--requests-per-minute', type=float, default=60, help="global limit on model requests (0 = none)")
+    parser.add_argument('--no-guide', action='store_true', help="only generate itineraries")
+    parser.add_argument('--no-cache', action='store_true', help="do not reuse cached itineraries")
+    args = parser.parse_args()
+
+    configure_logging()
+    set_rate_limit(args.requests_per_minute)
+    try:
+        specs = read_specs(args.specs)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    failures = run_batch(specs, args.output, args.docx_dir, args.model, args.concurrency,
+                         with_guide=not args.no_guide, use_cache=not args.no_cache)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+import argparse
+import json
+import multiprocessing
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Drives the page3/page4/page5 flows headlessly with Streamlit's AppTest, against the local fake server,
+# across N concurrent sessions. AppTest is not thread-safe, so every session runs in its own process and
+# all of them share one fake server. Run from the repository root: python -m benchmarks.bench_flows --sessions 8
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, 'app.py')
+PERCENTILES = (50, 90, 99)
+
+_ready = None
+_cold_start_seconds = None
+
+
+# Function to find a widget by its label in an AppTest element list
+def widget(elements, label):
+    for element in elements:
+        if element.label == label:
+            return element
+    raise LookupError(f"No widget labelled {label!r}")
+
+
+# Function to wait for a background job started by the last rerun, then rerun to render its result
+def wait_for_job(at, kind, timeout):
+    from jobs import ACTIVE_STATUSES, get_job_queue
+
+    deadline = time.perf_counter() + timeout
+    job_id = at.session_state[f'{kind}_job'] if f'{kind}_job' in at.session_state else None
+    while True:
+        job = get_job_queue().get(job_id) if job_id else None
+        if job is None:
+            raise LookupError(f"No {kind} job was started (job id {job_id!r})")
+        if job['status'] not in ACTIVE_STATUSES:
+            break
+        if time.perf_counter() > deadline:
+            raise TimeoutError(f"{kind} job {job_id} did not finish in {timeout}s")
+        time.sleep(0.02)
+    if job['status'] != 'done':
+        raise RuntimeError(f"{kind} job {job_id} {job['status']}: {job['error']}")
+    return at.run()
+
+
+# Function to run one simulated user through the chosen flow, returns the timing of every rerun
+def run_session(flow, turns, timeout, trace_memory=False):
+    from streamlit.testing.v1 import AppTest
+
+    import metrics
+
+    calls_before = len(metrics.get_records()[0])
+    if trace_memory:
+        tracemalloc.start()
+    steps = []
+
+    def timed(name, action):
+        start = time.perf_counter()
+        at_after = action()
+        steps.append((name, time.perf_counter() - start))
+        if at_after.exception:
+            raise RuntimeError(f"{name}: {at_after.exception[0].message}")
+        return at_after
+
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    flow_start = time.perf_counter()
+    timed('page1', at.run)
+
+    timed('page3_open', widget(at.sidebar.radio, "Go to").set_value('Page 3').run)
+    for turn in range(turns):
+        timed('page3_turn', at.chat_input[0].set_value(f"We would love option {turn + 1}, and good food").run)
+
+    if flow in ('page4', 'page5'):
+        timed('page4_open', widget(at.sidebar.radio, "Go to").set_value('Page 4').run)
+        widget(at.sidebar.button, "Generate Itinerary").click()
+        timed('page4_itinerary', lambda: wait_for_job(at.run(), 'itinerary', timeout))
+
+    if flow == 'page5':
+        timed('page5_open', widget(at.sidebar.radio, "Go to").set_value('Page 5').run)
+        widget(at.button, "Generate Guide").click()
+        timed('page5_guide', lambda: wait_for_job(at.run(), 'guide', timeout))
+
+    flow_seconds = time.perf_counter() - flow_start
+    traced_peak = None
+    if trace_memory:
+        traced_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    try:
+        state_bytes = len(pickle.dumps(at.session_state.to_dict()))
+    except Exception:
+        state_bytes = None
+    # Trip details, participants and chat live in the session store, measured as written there
+    from session_store import dump_session, get_session_manager
+    stored_bytes = len(dump_session(get_session_manager().get(at.session_state['session_id'])))
+    calls = [{'site': call['site'], 'error': call['error']} for call in metrics.get_records()[0][calls_before:]]
+    return {'steps': steps, 'flow_seconds': flow_seconds, 'state_bytes': state_bytes, 'stored_bytes': stored_bytes,
+            'calls': calls, 'traced_peak': traced_peak}
+
+
+# Function to prepare a worker process: same working directory and imports as the parent, then one page 1
+# session so the imports and cold caches are not counted in the measured flows
+def init_worker(timeout, ready):
+    global _ready, _cold_start_seconds
+    os.chdir(ROOT)
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    _ready = ready
+    start = time.perf_counter()
+    run_session('page1', 0, timeout)
+    _cold_start_seconds = time.perf_counter() - start
+
+
+# Function run once by every worker: it returns the worker's cold start when all of them are started and warm
+def wait_ready(_):
+    _ready.wait()
+    return _cold_start_seconds
+
+
+def percentiles(values):
+    return dict(zip(PERCENTILES, np.percentile(values, PERCENTILES).tolist())) if values else {}
+
+
+# Function to run the benchmark and build the report
+def run_benchmark(sessions, flow, turns, latency, token_rate, error_rate, timeout, trace_memory):
+    os.chdir(ROOT)
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    # The workers look the functions up by module name: AppTest replaces __main__ with the app script
+    from benchmarks import bench_flows
+    from benchmarks.fake_openai_server import start_fake_server
+
+    server = start_fake_server(latency=latency, token_rate=token_rate, error_rate=error_rate)
+    # Settings are read when the app modules are first imported, so they are set before any session starts;
+    # the worker processes inherit them. Every process keeps its own jobs and sessions in memory.
+    os.environ['openai_base_url'] = server.base_url
+    os.environ.setdefault('openai_api_key', 'benchmark')
+    os.environ['llm_cache_enabled'] = '0'
+    os.environ['llm_backoff_seconds'] = '0.05'
+    os.environ['jobs_path'] = ':memory:'
+    files_dir = tempfile.mkdtemp(prefix='bench_job_files_')
+    os.environ['job_files_dir'] = files_dir
+    os.environ['session_store'] = 'memory'
+    # The report is built from the records returned by the sessions, the JSON metrics log is not needed
+    os.environ.setdefault('metrics_log_path', os.devnull)
+
+    # Spawned rather than forked: the parent already runs the server, job and session threads
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=sessions, mp_context=context, initializer=bench_flows.init_worker,
+                             initargs=(timeout, context.Barrier(sessions))) as pool:
+        # Every worker is started and warm before the clock starts. The first session of a process also pays
+        # for imports and cold caches, it is reported apart.
+        cold_starts = list(pool.map(bench_flows.wait_ready, range(sessions)))
+        start = time.perf_counter()
+        futures = [pool.submit(bench_flows.run_session, flow, turns, timeout, trace_memory) for _ in range(sessions)]
+        results = [future.result() for future in futures]
+        wall_seconds = time.perf_counter() - start
+    server.shutdown()
+    shutil.rmtree(files_dir, ignore_errors=True)
+
+    calls = [call for result in results for call in result['calls']]
+    traced_peaks = [r['traced_peak'] for r in results if r['traced_peak'] is not None]
+    calls_per_site = {}
+    for call in calls:
+        calls_per_site[call['site']] = calls_per_site.get(call['site'], 0) + 1
+
+    step_times = {}
+    for result in results:
+        for name, seconds in result['steps']:
+            step_times.setdefault(name, []).append(seconds)
+    state_sizes = [r['state_bytes'] for r in results if r['state_bytes'] is not None]
+    stored_sizes = [r['stored_bytes'] for r in results]
+
+    return {
+        'sessions': sessions,
+        'flow': flow,
+        'turns': turns,
+        'cold_start_seconds': percentiles(cold_starts),
+        'wall_seconds': wall_seconds,
+        'flow_seconds': percentiles([r['flow_seconds'] for r in results]),
+        'rerun_seconds': {name: percentiles(times) for name, times in step_times.items()},
+        'llm_calls_per_flow': {site: count / sessions for site, count in sorted(calls_per_site.items())},
+        'llm_errors': sum(1 for c in calls if c['error']),
+        'server_calls': dict(server.calls),
+        'server_injected_errors': server.errors,
+        'session_state_bytes': percentiles(state_sizes),
+        'session_store_bytes': percentiles(stored_sizes),
+        'traced_memory_peak_bytes_per_session': float(np.mean(traced_peaks)) if traced_peaks else None
+    }
+
+
+def format_percentiles(values, scale=1.0, unit='s'):
+    return '  '.join(f"p{p}={value * scale:.3f}{unit}" for p, value in values.items())
+
+
+def print_report(report):
+    print(f"Flow {report['flow']} x {report['sessions']} concurrent sessions, {report['turns']} chat turns each")
+    print(f"Cold start (first session of a process, page 1): {format_percentiles(report['cold_start_seconds'])}")
+    print(f"Wall time: {report['wall_seconds']:.3f}s")
+    print(f"End-to-end flow latency: {format_percentiles(report['flow_seconds'])}")
+    print("Rerun cost per step:")
+    for name, values in report['rerun_seconds'].items():
+        print(f"  {name:<16} {format_percentiles(values)}")
+    print("LLM calls per flow: " + ', '.join(f"{site}={count:g}" for site, count in report['llm_calls_per_flow'].items()))
+    print(f"LLM errors seen by the app: {report['llm_errors']} (injected by the server: {report['server_injected_errors']})")
+    if report['session_state_bytes']:
+        print(f"Session state size: {format_percentiles(report['session_state_bytes'], 1 / 1024, ' KiB')}")
+    print(f"Stored session size (compressed): {format_percentiles(report['session_store_bytes'], 1 / 1024, ' KiB')}")
+    if report['traced_memory_peak_bytes_per_session']:
+        print(f"Traced memory peak per session: {report['traced_memory_peak_bytes_per_session'] / 1024 / 1024:.2f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the chatbot, itinerary and guide flows")
+    parser.add_argument('--sessions', type=int, default=4, help="number of concurrent simulated sessions")
+    parser.add_argument('--flow', choices=('page3', 'page4', 'page5'), default='page5',
+                        help="page3 = chat only, page4 = chat + itinerary, page5 = chat + itinerary + guide")
+    parser.add_argument('--turns', type=int, default=3, help="chat turns per session")
+    parser.add_argument('--latency', type=float, default=0.2, help="fake server seconds before the first token")
+    parser.add_argument('--token-rate', type=float, default=200.0, help="fake server tokens per second")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of requests answered with a 429")
+    parser.add_argument('--timeout', type=float, default=120.0, help="seconds allowed for one rerun")
+    parser.add_argument('--trace-memory', action='store_true', help="also trace Python allocations (slower)")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.sessions, args.flow, args.turns, args.latency, args.token_rate,
+                           args.error_rate, args.timeout, args.trace_memory)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Measures the cold start of every page: each run is a fresh Python process that renders page 1 with
+# Streamlit's AppTest and then opens the page under test, so import costs are paid the way a new server
+# process pays them. Run from the repository root: python -m benchmarks.bench_startup --repeat 5
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, 'app.py')
+PAGES = ('Page 1', 'Page 2', 'Page 3', 'Page 4', 'Page 5')
+# Dependencies that should only be imported by the pages that need them
+HEAVY_MODULES = ('openai', 'httpx', 'docx', 'geopandas', 'shapely', 'pyproj', 'numpy', 'pandas')
+
+
+# Function to render one page in this (fresh) process and return its timings, used by the child processes
+def measure_page_startup(page, timeout):
+    start = time.perf_counter()
+    os.chdir(ROOT)
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    from streamlit.testing.v1 import AppTest
+    import_seconds = time.perf_counter() - start
+
+    # Page 3 asks its opening question on first render, it is answered by the local fake server
+    server = None
+    if page == 'Page 3':
+        from benchmarks.fake_openai_server import start_fake_server
+        server = start_fake_server(latency=0.0, token_rate=0.0, reply_tokens=20)
+        os.environ['openai_base_url'] = server.base_url
+        os.environ.setdefault('openai_api_key', 'benchmark')
+        os.environ['llm_cache_enabled'] = '0'
+    os.environ.setdefault('jobs_path', os.path.join(ROOT, 'data', 'bench_jobs.sqlite3'))
+    os.environ.setdefault('session_store', 'memory')
+    modules_before = set(sys.modules)
+
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    page1_start = time.perf_counter()
+    at.run()
+    page_seconds = page1_seconds = time.perf_counter() - page1_start
+    if page != 'Page 1':
+        page_start = time.perf_counter()
+        next(radio for radio in at.sidebar.radio if radio.label == "Go to").set_value(page).run()
+        page_seconds = time.perf_counter() - page_start
+    if at.exception:
+        raise RuntimeError(f"{page}: {at.exception[0].message}")
+    if server:
+        server.shutdown()
+
+    loaded = set(sys.modules) - modules_before
+    return {
+        'page': page,
+        'import_seconds': import_seconds,
+        'page1_seconds': page1_seconds,
+        'page_seconds': page_seconds,
+        'first_render_seconds': time.perf_counter() - start,
+        'heavy_modules': [name for name in HEAVY_MODULES if name in loaded]
+    }
+
+
+# Function to run one page in a fresh interpreter, the wall time also includes the interpreter start
+def run_child(page, timeout):
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_startup', '--child', page, '--timeout', str(timeout)],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result['process_seconds'] = time.perf_counter() - start
+    return result
+
+
+# Function to run every page `repeat` times and keep the median of each timing
+def run_benchmark(pages, repeat, timeout):
+    report = []
+    for page in pages:
+        runs = [run_child(page, timeout) for _ in range(repeat)]
+        row = {'page': page, 'runs': repeat, 'heavy_modules': runs[-1]['heavy_modules']}
+        for key in ('process_seconds', 'first_render_seconds', 'import_seconds', 'page1_seconds', 'page_seconds'):
+            row[key] = statistics.median(run[key] for run in runs)
+        report.append(row)
+    return report
+
+
+def print_report(report):
+    print(f"{'page':<8} {'process':>9} {'first render':>13} {'streamlit':>10} {'page 1':>8} {'this page':>10}  heavy modules loaded")
+    for row in report:
+        print(f"{row['page']:<8} {row['process_seconds']:>8.3f}s {row['first_render_seconds']:>12.3f}s "
+              f"{row['import_seconds']:>9.3f}s {row['page1_seconds']:>7.3f}s {row['page_seconds']:>9.3f}s  "
+              f"{', '.join(row['heavy_modules']) or '-'}")
+    print(f"Medians of {report[0]['runs']} fresh processes per page. first render = from the start of the process "
+          "(after the interpreter) until the page is drawn; this page = the rerun that opens it after page 1")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold start benchmark: time to first render of each page")
+    parser.add_argument('--pages', nargs='+', choices=PAGES, default=PAGES, metavar='PAGE', help="pages to measure")
+    parser.add_argument('--repeat', type=int, default=3, help="fresh processes per page")
+    parser.add_argument('--timeout', type=float, default=60.0, help="seconds allowed for one rerun")
+    parser.add_argument('--child', choices=PAGES, help=argparse.SUPPRESS)
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_page_startup(args.child, args.timeout)))
+        return
+
+    report = run_benchmark(args.pages, args.repeat, args.timeout)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
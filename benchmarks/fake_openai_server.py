@@ -0,0 +1,174 @@
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-in for the chat completions endpoint, with configurable latency, token rate and error injection.
+# Point the app at it with openai_base_url=http://127.0.0.1:<port>/v1
+
+
+# Function to read the day numbers asked for by a structured itinerary request ("Days to write: 1-3, 7")
+def requested_days(text):
+    match = re.search(r'^Days to write: (.*)$', text, re.MULTILINE)
+    numbers = []
+    for part in (match.group(1).split(',') if match else []):
+        first, _, last = part.strip().partition('-')
+        numbers.extend(range(int(first), int(last or first) + 1))
+    return numbers
+
+
+# Function to build a structured itinerary answer: one place per day, reached from the previous day's place
+def fake_plan(text):
+    legs_only = 'only their transport legs' in text
+    days = []
+    for number in requested_days(text):
+        legs = [] if number == 1 else [{'from': f"Place {number - 1}", 'to': f"Place {number}", 'mode': 'bus', 'hours': 2}]
+        day = {'day': number, 'transport': legs}
+        if not legs_only:
+            day.update({'country': 'Thailand', 'location': f"Place {number}", 'summary': f"Day {number} of the trip",
+                        'activities': [f"Activity {number}a", f"Activity {number}b"]})
+        days.append(day)
+    return json.dumps({'days': days})
+
+
+# Function to build the fake answer for a request: a numbered list for TOC prompts, JSON days for structured
+# itinerary requests, filler text otherwise
+def fake_reply(messages, config):
+    last = messages[-1]['content'] if messages else ''
+    if 'table of contents' in last.lower():
+        return '\n'.join(f"{i}. Chapter {i}" for i in range(1, config['toc_entries'] + 1))
+    if 'Answer with JSON only' in last:
+        return fake_plan(last)
+    return ' '.join(f"word{i}" for i in range(config['reply_tokens']))
+
+
+class FakeChatHandler(BaseHTTPRequestHandler):
+    server_version = 'FakeOpenAI/1.0'
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('content-type', 'application/json')
+        self.send_header('content-length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_chunk(self, payload):
+        self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode('utf-8'))
+        self.wfile.flush()
+
+    def do_POST(self):
+        config = self.server.config
+        request = json.loads(self.rfile.read(int(self.headers.get('content-length', 0))) or b'{}')
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self.send_json(404, {'error': {'message': f"Unknown path {self.path}", 'type': 'invalid_request_error'}})
+            return
+
+        model = request.get('model', 'fake-model')
+        with self.server.lock:
+            self.server.calls[model] = self.server.calls.get(model, 0) + 1
+
+        if model in config['failing_models']:
+            self.send_json(503, {'error': {'message': f"{model} is unavailable (injected)", 'type': 'server_error'}})
+            return
+
+        if random.random() < config['error_rate']:
+            with self.server.lock:
+                self.server.errors += 1
+            self.send_json(429, {'error': {'message': 'Rate limit reached (injected)', 'type': 'rate_limit_error'}},
+                           headers={'retry-after': str(config['retry_after'])})
+            return
+
+        reply = fake_reply(request.get('messages', []), config)
+        tokens = reply.split(' ')
+        prompt_tokens = sum(len(str(m.get('content', ''))) // 4 + 1 for m in request.get('messages', []))
+        usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': len(tokens), 'total_tokens': prompt_tokens + len(tokens)}
+        created = int(time.time())
+        token_delay = 1.0 / config['token_rate'] if config['token_rate'] else 0.0
+
+        time.sleep(config['latency'])
+        if not request.get('stream'):
+            time.sleep(token_delay * len(tokens))
+            self.send_json(200, {
+                'id': 'chatcmpl-fake', 'object': 'chat.completion', 'created': created, 'model': model,
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': reply}, 'finish_reason': 'stop'}],
+                'usage': usage
+            })
+            return
+
+        self.send_response(200)
+        self.send_header('content-type', 'text/event-stream')
+        self.end_headers()
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(token_delay)
+            self.send_chunk({
+                'id': 'chatcmpl-fake', 'object': 'chat.completion.chunk', 'created': created, 'model': model,
+                'choices': [{'index': 0, 'delta': {'content': token if i == 0 else ' ' + token}, 'finish_reason': None}]
+            })
+        if (request.get('stream_options') or {}).get('include_usage'):
+            self.send_chunk({'id': 'chatcmpl-fake', 'object': 'chat.completion.chunk', 'created': created,
+                             'model': model, 'choices': [], 'usage': usage})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+class FakeChatServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    # Clients giving up on a slow answer (timeouts, hedged requests) are expected, not worth a traceback
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+# Function to start the fake server in a background thread; port 0 picks a free port. failing_models are
+# always answered with a 503, to exercise the fallback to the next model tier
+def start_fake_server(port=0, latency=0.2, token_rate=200.0, error_rate=0.0, reply_tokens=60, toc_entries=8, retry_after=0,
+                      failing_models=()):
+    server = FakeChatServer(('127.0.0.1', port), FakeChatHandler)
+    server.config = {
+        'latency': latency,
+        'token_rate': token_rate,
+        'error_rate': error_rate,
+        'reply_tokens': reply_tokens,
+        'toc_entries': toc_entries,
+        'retry_after': retry_after,
+        'failing_models': set(failing_models)
+    }
+    server.calls = {}
+    server.errors = 0
+    server.lock = threading.Lock()
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI chat completions server for offline benchmarks")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument('--token-rate', type=float, default=200.0, help="tokens per second after the first one")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of requests answered with a 429")
+    parser.add_argument('--reply-tokens', type=int, default=60)
+    parser.add_argument('--toc-entries', type=int, default=8)
+    args = parser.parse_args()
+    server = start_fake_server(args.port, args.latency, args.token_rate, args.error_rate, args.reply_tokens, args.toc_entries)
+    print(f"Fake chat completions server on {server.base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
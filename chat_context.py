@@ -0,0 +1,80 @@
+import os
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Token budget of the messages sent for one chat turn (system prompt + summary + recent turns)
+CHAT_CONTEXT_TOKEN_BUDGET = int(os.getenv('chat_context_token_budget', 6000))
+# Once older turns have to be folded, recent turns are trimmed to this share of the budget,
+# so the summary is not updated again on the very next turn
+CHAT_CONTEXT_REFOLD_RATIO = 0.6
+CHAT_SUMMARY_MAX_TOKENS = 400
+# Extra tokens the chat format adds around every message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding('cl100k_base')
+    except Exception:
+        return None
+
+
+# Function to count the tokens of a text (about 4 characters per token when tiktoken is unavailable)
+def count_tokens(text):
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text))
+
+
+# Function to count the tokens of a list of chat messages
+def count_message_tokens(messages):
+    return sum(count_tokens(msg['content']) + MESSAGE_OVERHEAD_TOKENS for msg in messages)
+
+
+# Function to create the per-conversation summary state (summary text + index of the first unsummarized message)
+def new_summary_state(messages=None):
+    start = 1 if messages and messages[0]['role'] == 'system' else 0
+    return {'summary': '', 'upto': start}
+
+
+# Function to find where the verbatim window of recent turns starts so that it fits the given token count
+def recent_window_start(messages, start, available):
+    cutoff = len(messages)
+    used = 0
+    while cutoff > start:
+        cost = count_message_tokens(messages[cutoff - 1:cutoff])
+        # The latest message is always kept, even when it alone is over budget
+        if used + cost > available and cutoff < len(messages):
+            break
+        used += cost
+        cutoff -= 1
+    return cutoff
+
+
+# Function to build the messages for one request: the system prompt, a rolling summary of older turns
+# and the recent turns verbatim. summarize(previous_summary, new_messages) is only called for turns
+# that were not folded into the summary before, and state is updated in place.
+def compact_messages(messages, state, summarize, budget=CHAT_CONTEXT_TOKEN_BUDGET):
+    head = messages[:1] if messages and messages[0]['role'] == 'system' else []
+    start = max(state['upto'], len(head))
+
+    reserve = CHAT_SUMMARY_MAX_TOKENS + MESSAGE_OVERHEAD_TOKENS
+    available = budget - count_message_tokens(head) - reserve
+    if count_message_tokens(messages[start:]) > available:
+        cutoff = recent_window_start(messages, start, int(available * CHAT_CONTEXT_REFOLD_RATIO))
+        if cutoff > start:
+            state['summary'] = summarize(state['summary'], messages[start:cutoff])
+            state['upto'] = start = cutoff
+
+    if not state['summary']:
+        return head + messages[start:]
+    summary_message = {"role": "system", "content": f"Summary of the earlier conversation:\n{state['summary']}"}
+    return head + [summary_message] + messages[start:]
@@ -0,0 +1,63 @@
+import os
+from functools import lru_cache
+
+import streamlit as st
+
+# How many chat messages are shown at once, older ones are loaded on request
+CHAT_PAGE_SIZE = int(os.getenv('chat_page_size', 30))
+
+
+# Function to escape the text of a message for markdown, also used on streamed chunks
+def escape_markdown(text):
+    # A dollar sign would otherwise start a LaTeX block ("$50 to $80 per night")
+    return text.replace('$', '\\$')
+
+
+# Function to turn a message into the markdown that is rendered, cached since history is redrawn every rerun
+@lru_cache(maxsize=4096)
+def message_markdown(content):
+    return escape_markdown(content)
+
+
+# Function to write one chat message
+def render_message(role, content):
+    st.chat_message(role).markdown(message_markdown(content))
+
+
+# Function to write a chat message as its chunks arrive, escaped the same way as the history so it does not
+# change once redrawn from it. Returns the message text as received
+def render_stream(role, chunks):
+    parts = []
+
+    def escaped():
+        for chunk in chunks:
+            parts.append(chunk)
+            yield escape_markdown(chunk)
+
+    st.chat_message(role).write_stream(escaped())
+    return ''.join(parts)
+
+
+# Function to show more of the older messages on the next rerun
+def show_earlier_messages(state_key, page_size):
+    st.session_state[state_key] = st.session_state.get(state_key, page_size) + page_size
+
+
+# Function to render the chat history: the context prompt folded away and only the latest page of turns
+def render_chat_history(messages, state_key='chat_visible_messages', page_size=CHAT_PAGE_SIZE):
+    turns = messages
+    if messages and messages[0]['role'] == 'system':
+        with st.expander("Trip context given to the travel agent"):
+            st.markdown(message_markdown(messages[0]['content']))
+        turns = messages[1:]
+
+    visible = st.session_state.get(state_key, page_size)
+    hidden = max(0, len(turns) - visible)
+    if hidden:
+        st.button(
+            f"Show earlier messages ({hidden} hidden)",
+            on_click=show_earlier_messages,
+            args=(state_key, page_size)
+        )
+    for msg in turns[hidden:]:
+        render_message(msg['role'], msg['content'])
@@ -0,0 +1,86 @@
+import hashlib
+import json
+import os
+import sys
+from functools import lru_cache
+
+COUNTRIES_PATH = os.path.join('data', 'merged_file.gpkg')
+NAME_COLUMN = 'field_3'
+# Precomputed country list shipped with the app, so the first page renders without loading geopandas.
+# Rebuild it with `python countries.py` after replacing the GeoPackage
+COUNTRY_LIST_PATH = os.path.join('data', 'countries.json')
+
+
+# Function to get a cheap fingerprint of the GeoPackage (changes when the file is replaced)
+def file_signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+# Function to get the content hash of the GeoPackage, it survives a git checkout unlike the modification time
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Function to read the country names straight from the GeoPackage, skipping the geometries
+def read_country_names(path):
+    import geopandas as gpd
+
+    data = gpd.read_file(path, columns=[NAME_COLUMN], ignore_geometry=True)
+    data = data[data[NAME_COLUMN].notna()]
+    return sorted(data[NAME_COLUMN].unique().tolist())
+
+
+# Function to read the precomputed country list, returns None if it is missing or was built from another file
+def read_country_list(path, list_path):
+    try:
+        with open(list_path, encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if index.get('size') != os.path.getsize(path) or index.get('sha256') != file_digest(path):
+        return None
+    return index.get('countries')
+
+
+# Function to write the precomputed country list, a failure here only costs a slower cold start
+def write_country_list(path, list_path, countries):
+    tmp = list_path + '.tmp'
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'source': os.path.basename(path), 'size': os.path.getsize(path), 'sha256': file_digest(path),
+                       'countries': countries}, f, ensure_ascii=False, indent=1)
+            f.write('\n')
+        os.replace(tmp, list_path)
+    except OSError:
+        pass
+
+
+@lru_cache(maxsize=4)
+def _load_country_names(path, signature, list_path):
+    if list_path:
+        countries = read_country_list(path, list_path)
+        if countries is not None:
+            return tuple(countries)
+    countries = read_country_names(path)
+    if list_path:
+        write_country_list(path, list_path, countries)
+    return tuple(countries)
+
+
+# Function to get the sorted country names, memoized for the whole process until the file changes.
+# Pass list_path=None to always read the GeoPackage
+def load_country_names(path=COUNTRIES_PATH, list_path=COUNTRY_LIST_PATH):
+    return list(_load_country_names(path, file_signature(path), list_path))
+
+
+# Rebuild the precomputed country list: python countries.py [path/to/file.gpkg]
+if __name__ == "__main__":
+    source = sys.argv[1] if len(sys.argv) > 1 else COUNTRIES_PATH
+    names = read_country_names(source)
+    write_country_list(source, COUNTRY_LIST_PATH, names)
+    print(f"{len(names)} countries written to {COUNTRY_LIST_PATH}")
@@ -0,0 +1,130 @@
+from geo_index import describe_country_route
+from guide import GuideBuilder, generate_chapters, parse_toc
+from llm import RETRYABLE_ERRORS
+from llm_cache import cache_stream, get_response_cache, make_cache_key
+from routing import get_route, routed_completion, stale_answer
+
+# Prompt builders and model calls shared by the Streamlit pages and the batch mode, nothing here reads st.session_state
+
+ITINERARY_INSTRUCTIONS = "Based on the above conversation, generate the best travel itinerary. Take into account that this conversation is not meant to include everything that should be in the plan. It helps you understanding the tastes of the travellers. Use it as a reference but then propose them the plan you think would be best, based on available time and optimizing logistics etc. It has to be a day by day plan, that takes into account feasibility, travel, movements, tastes of the participants, and includes the must see places in the country or countries, the time of the year. You are literally the best travel agent in the world and you need to design the best possible trip for your customers"
+GUIDE_WRITER_PROMPT = "You are a professional travel guide writer."
+
+
+# Function to build the travel context from the trip details
+def build_travel_context(start_date, end_date, countries, participants):
+    context = "As a travel agent, I need to refine our travel plan. Here's the information I have:\n"
+    context += f"Travel Dates: {start_date} to {end_date}\n"
+    context += f"Destinations: {', '.join(countries)}\n"
+    context += "Only participant(s):\n"
+    for participant in participants:
+        context += f"- {participant['name']}, {participant['age']} years old, {participant['gender']}, "
+        context += f"prefers {participant['preference']}. Additional notes: {participant['additional_preferences']}\n"
+    return context
+
+
+# Function to build the chatbot's system prompt from the travel context
+def build_chat_prompt(travel_context):
+    return f"You are a travel agent and based on the following travel plan details:\n{travel_context}\nGenerate one question to refine the trip planning until you think you have a good plan to suggest. You are talking with the traveller(s). Please start from the assumption that they don't know nothing about the countries they are visiting so instead of asking for suggestions about names of places they would like to go, try to propose options for them to choose so that you learn their tastes. Take into account the total time they said they want they trip to last (you have the info above), and make sure you help them plan the best trip ever."
+
+
+# Function to build the itinerary prompt from the conversation and the countries to visit
+def build_itinerary_prompt(messages, countries):
+    # Format the conversation into a prompt
+    prompt = "\n".join([f"{msg['role']}: {msg['content']}" for msg in messages])
+
+    # Add the visiting order computed from the country geometries, so the model does not plan back-and-forth routes
+    route = describe_country_route(countries)
+    if route:
+        prompt += f"\n\n{route}\nFollow this order unless the conversation gives a good reason not to."
+
+    # Add additional instructions for the AI if needed
+    prompt += f"\n\n{ITINERARY_INSTRUCTIONS}"
+    return prompt
+
+
+# Function to generate the itinerary, returns a generator of text chunks when stream is True
+def generate_itinerary(messages, model, countries, stream=False, use_cache=True):
+    request_messages = [{"role": "system", "content": build_itinerary_prompt(messages, countries)}]
+    cache_key = make_cache_key(model, request_messages)
+
+    # Look for an itinerary already generated from the same conversation
+    cache = get_response_cache() if use_cache else None
+    if cache:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return iter([cached]) if stream else cached
+
+    # Send the prompt to OpenAI API, falling back to a faster model and then to an expired cached itinerary
+    try:
+        itinerary, answered_by = routed_completion("itinerary", request_messages, model=model, stream=stream, with_model=True)
+    except RETRYABLE_ERRORS:
+        stale = stale_answer("itinerary", cache_key)
+        if stale is None:
+            raise
+        return iter([stale]) if stream else stale
+    # A fallback model's answer is cached under that model, not served later as the chosen model's answer
+    cache_key = make_cache_key(answered_by, request_messages)
+    if stream:
+        return cache_stream(cache, cache_key, itinerary) if cache else itinerary
+    if cache:
+        cache.set(cache_key, itinerary)
+    return itinerary
+
+
+# Function to generate guide content (answers are cached, pass use_cache=False to always call the model).
+# site is the routing policy (toc or chapter) that picks the model and parameters. Errors are returned as the
+# text, so the page still gets a guide; with raise_errors they are raised instead
+def generate_content_with_gpt4(assistant_prompt, user_prompt, use_cache=True, site="chapter", raise_errors=False):
+    messages = [
+        {"role": "assistant", "content": assistant_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+    route = get_route(site)
+    cache_key = make_cache_key(route['models'][0], messages, **route['params'])
+
+    cache = get_response_cache() if use_cache else None
+    if cache:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    try:
+        content, answered_by = routed_completion(site, messages, with_model=True)
+        content = content.strip()
+    except Exception as e:
+        stale = stale_answer(site, cache_key)
+        if stale is None and raise_errors:
+            raise
+        return stale or str(e)
+    if cache:
+        cache.set(make_cache_key(answered_by, messages, **route['params']), content)
+    return content
+
+
+# Function to build the travel guide's table of contents prompt from the countries and travellers
+def build_guide_prompt(countries, participants):
+    user_prompt = f"Please create a table of contents for a travel guide based on the following details: " \
+                  f"Countries: {', '.join(countries)}. " \
+                  f"Travelers: {len(participants)} - "
+    for p in participants:
+        user_prompt += f"{p['name']} ({p['age']} years old, {p['gender']}, {p['preference']}). "
+    return user_prompt
+
+
+# Function to generate the whole travel guide and write the .docx to output (a path or a binary file), on_progress
+# gets the share of chapters done. With raise_errors a failed model call fails the guide instead of writing the error into it
+def generate_travel_guide(assistant_prompt, user_prompt, output, on_progress=None, raise_errors=False):
+    toc = parse_toc(generate_content_with_gpt4(assistant_prompt, user_prompt, site="toc", raise_errors=raise_errors))
+
+    # Chapters are generated concurrently and appended to the document as they arrive
+    builder = GuideBuilder(toc)
+    generate_chapters(
+        [title for _, title in toc],
+        lambda title: generate_content_with_gpt4(assistant_prompt, f"Write a chapter about '{title}' for a travel guide.",
+                                                 raise_errors=raise_errors),
+        on_progress=(lambda done, total: on_progress(done / total)) if on_progress else None,
+        on_chapter=builder.add_chapter
+    )
+
+    builder.save(output)
+    return output
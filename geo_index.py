@@ -0,0 +1,158 @@
+import os
+from functools import lru_cache
+from itertools import permutations
+
+import numpy as np
+
+from countries import COUNTRIES_PATH, NAME_COLUMN, file_signature
+
+EARTH_RADIUS_KM = 6371.0
+# Countries closer than this (in degrees) are treated as sharing a border, to absorb small gaps in the data
+BORDER_TOLERANCE_DEGREES = 0.01
+# Legs between neighbouring countries cost a bit less, overland crossings are easier to organise than flights
+BORDER_LEG_FACTOR = 0.8
+# Up to this many countries every visiting order is tried, above it a heuristic is used
+EXACT_ROUTE_MAX_COUNTRIES = 7
+
+
+# Function to get the path of the precomputed spatial index stored next to the GeoPackage
+def index_path(path):
+    return os.path.splitext(path)[0] + '.geoindex.npz'
+
+
+# Function to compute the great-circle distance (km) between every pair of points, vectorized
+def haversine_matrix(lat, lon):
+    lat = np.radians(lat)
+    lon = np.radians(lon)
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat[:, None]) * np.cos(lat[None, :]) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+# Function to build the spatial index from the GeoPackage: names, centroids, distance matrix and shared borders
+def build_country_index(path):
+    import geopandas as gpd
+
+    data = gpd.read_file(path, columns=[NAME_COLUMN])
+    data = data[data[NAME_COLUMN].notna()].dissolve(by=NAME_COLUMN).sort_index()
+    names = data.index.to_numpy(dtype=str)
+
+    # Centroids are computed in an equal-area projection, then brought back to longitude/latitude
+    centroids = data.geometry.to_crs('EPSG:6933').centroid.to_crs('EPSG:4326')
+    lat = centroids.y.to_numpy()
+    lon = centroids.x.to_numpy()
+
+    geometries = data.geometry.reset_index(drop=True)
+    left, right = geometries.sindex.query(geometries, predicate='dwithin', distance=BORDER_TOLERANCE_DEGREES)
+    borders = np.zeros((len(names), len(names)), dtype=bool)
+    borders[left, right] = True
+    np.fill_diagonal(borders, False)
+
+    return {
+        'names': names,
+        'lat': lat,
+        'lon': lon,
+        'distances': haversine_matrix(lat, lon).astype(np.float32),
+        'borders': borders
+    }
+
+
+# Function to read the precomputed index, returns None if it is missing or stale
+def read_index(path, signature):
+    try:
+        with np.load(index_path(path), allow_pickle=False) as stored:
+            if stored['signature'].tolist() != list(signature):
+                return None
+            return {key: stored[key] for key in ('names', 'lat', 'lon', 'distances', 'borders')}
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+# Function to write the index, a failure here only costs rebuilding it on the next start
+def write_index(path, signature, index):
+    target = index_path(path)
+    tmp = target + '.tmp.npz'
+    try:
+        np.savez_compressed(tmp, signature=np.array(signature, dtype=np.int64), **index)
+        os.replace(tmp, target)
+    except OSError:
+        pass
+
+
+@lru_cache(maxsize=2)
+def _load_country_index(path, signature):
+    index = read_index(path, signature)
+    if index is None:
+        index = build_country_index(path)
+        write_index(path, signature, index)
+    index['positions'] = {name: i for i, name in enumerate(index['names'].tolist())}
+    return index
+
+
+# Function to get the spatial index, built once and cached for the whole process until the file changes
+def load_country_index(path=COUNTRIES_PATH):
+    return _load_country_index(path, file_signature(path))
+
+
+# Function to get the total cost of visiting the countries in the given order (no return leg)
+def route_cost(order, costs):
+    return sum(costs[a, b] for a, b in zip(order, order[1:]))
+
+
+# Function to improve a route by reversing segments while it gets shorter (2-opt)
+def two_opt(order, costs):
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, len(order) - 1):
+            for j in range(i + 1, len(order)):
+                candidate = order[:i] + order[i:j + 1][::-1] + order[j + 1:]
+                if route_cost(candidate, costs) < route_cost(order, costs) - 1e-9:
+                    order = candidate
+                    improved = True
+    return order
+
+
+# Function to build a route greedily, always going to the nearest country not visited yet
+def nearest_neighbour(start, costs):
+    order = [start]
+    remaining = set(range(len(costs))) - {start}
+    while remaining:
+        nearest = min(remaining, key=lambda j: costs[order[-1], j])
+        order.append(nearest)
+        remaining.remove(nearest)
+    return order
+
+
+# Function to find a near-optimal visiting order of the countries, returns the names in order
+def plan_country_route(countries, index=None):
+    index = index or load_country_index()
+    known = [name for name in dict.fromkeys(countries) if name in index['positions']]
+    if len(known) < 2:
+        return known
+
+    ids = np.array([index['positions'][name] for name in known])
+    costs = index['distances'][np.ix_(ids, ids)].astype(float)
+    costs = np.where(index['borders'][np.ix_(ids, ids)], costs * BORDER_LEG_FACTOR, costs)
+
+    if len(known) <= EXACT_ROUTE_MAX_COUNTRIES:
+        best = min(permutations(range(len(known))), key=lambda order: route_cost(order, costs))
+    else:
+        candidates = [two_opt(nearest_neighbour(start, costs), costs) for start in range(len(known))]
+        best = min(candidates, key=lambda order: route_cost(order, costs))
+    return [known[i] for i in best]
+
+
+# Function to describe the suggested route for the itinerary prompt
+def describe_country_route(countries, index=None):
+    index = index or load_country_index()
+    route = plan_country_route(countries, index)
+    if len(route) < 2:
+        return ""
+    legs = []
+    for a, b in zip(route, route[1:]):
+        i, j = index['positions'][a], index['positions'][b]
+        crossing = "shared border" if index['borders'][i, j] else "no shared border"
+        legs.append(f"{a} -> {b} ({crossing}, about {index['distances'][i, j]:.0f} km between centres)")
+    return "Suggested visiting order to keep travel efficient: " + " -> ".join(route) + ".\nLegs:\n" + "\n".join(f"- {leg}" for leg in legs)
@@ -0,0 +1,158 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# How many chapters are requested from the model at the same time
+GUIDE_MAX_CONCURRENCY = int(os.getenv('guide_max_concurrency', 4))
+GUIDE_MAX_HEADING_LEVEL = 3
+
+TOC_TITLE_PATTERN = re.compile(r'^(table of contents|contents)\s*:?$', re.IGNORECASE)
+MARKDOWN_HEADING_PATTERN = re.compile(r'^(#{1,6})\s+(.*)$')
+# "1. Title", "2) Title", "1.2 Title" or "1.2. Title"; a number without punctuation ("2024 Festivals") is a title
+NUMBERED_PATTERN = re.compile(r'^(\d+(?:\.\d+)+\.?|\d+[.):])\s+(.*)$')
+CHAPTER_PATTERN = re.compile(r'^(?:chapter|part)\s+[\divxlc]+\s*[:.\-]\s*(.*)$', re.IGNORECASE)
+# Letters and roman numerals share this pattern, which one a marker is depends on the entries around it
+ALPHA_PATTERN = re.compile(r'^([a-zA-Z]+)[.)]\s+(.*)$')
+ROMAN_NUMERAL_PATTERN = re.compile(r'^M{0,3}(CM|CD|D?C{0,3})(XC|XL|L?X{0,3})(IX|IV|V?I{0,3})$')
+BULLET_PATTERN = re.compile(r'^([-*•])\s+(.*)$')
+ROMAN_VALUES = {'I': 1, 'V': 5, 'X': 10, 'L': 50, 'C': 100, 'D': 500, 'M': 1000}
+
+
+# Function to get the value of a roman numeral, or None if the marker is not one
+def roman_value(marker):
+    marker = marker.upper()
+    if not marker or not ROMAN_NUMERAL_PATTERN.match(marker):
+        return None
+    total = 0
+    for i, char in enumerate(marker):
+        value = ROMAN_VALUES[char]
+        total += -value if i + 1 < len(marker) and ROMAN_VALUES[marker[i + 1]] > value else value
+    return total
+
+
+# Function to split one TOC line into (indent, style, marker, title), returns None for lines that are not entries.
+# The style is (kind, depth): markdown and dotted numbers carry their own depth ("###", "1.2")
+def parse_toc_line(line):
+    line = line.expandtabs(4)
+    indent = len(line) - len(line.lstrip())
+    text = line.strip().strip('*').strip()
+    if not text or TOC_TITLE_PATTERN.match(text):
+        return None
+
+    if match := MARKDOWN_HEADING_PATTERN.match(text):
+        style, marker, title = ('markdown', len(match.group(1))), None, match.group(2)
+    elif match := CHAPTER_PATTERN.match(text):
+        style, marker, title = ('chapter', 1), None, match.group(1)
+    elif match := NUMBERED_PATTERN.match(text):
+        style, marker, title = ('numbered', match.group(1).rstrip('.):').count('.') + 1), None, match.group(2)
+    elif (match := ALPHA_PATTERN.match(text)) and (len(match.group(1)) == 1 or roman_value(match.group(1))):
+        style, marker, title = ('alpha', 1), match.group(1), match.group(2)
+    elif match := BULLET_PATTERN.match(text):
+        style, marker, title = ('bullet', 1), None, match.group(2)
+    else:
+        style, marker, title = ('plain', 1), None, text
+
+    title = title.strip().strip('*').strip()
+    if not title:
+        return None
+    return indent, style, marker, title
+
+
+# Function to tell roman numerals from letters. A single I, V, X, L, C, D or M is a letter when it continues
+# the letters before it at the same indent (H. I. J.), and a roman numeral when it continues the numerals (I. II.)
+# or starts them (I. after 2. Thailand)
+def resolve_alpha_styles(entries):
+    resolved = []
+    # Last letter and roman value seen per indent, forgotten when a shallower entry starts a new parent
+    last = {}
+    for indent, style, marker, title in entries:
+        for deeper in [i for i in last if i > indent]:
+            del last[deeper]
+        letter, roman = last.get(indent, (0, 0))
+        if style[0] == 'alpha':
+            value = roman_value(marker)
+            position = ord(marker.upper()) - ord('A') + 1 if len(marker) == 1 else None
+            if value is not None and (position is None or (position != letter + 1 and value == roman + 1)):
+                style = ('roman', 1)
+                roman, letter = value, 0
+            else:
+                style = ('letter', 1)
+                letter = position or letter
+        elif style[0] in ('numbered', 'markdown', 'chapter'):
+            # A new numbered parent restarts the letters below it in unindented TOCs
+            letter = 0
+        last[indent] = (letter, roman)
+        resolved.append((indent, style, title))
+    return resolved
+
+
+# Function to parse the model's table of contents into a list of (heading level, title).
+# An entry is nested under the entry before it when it is indented further, or when it is at the same
+# indent with a numbering style first seen later in the TOC (1. then A. then -, ## then ###).
+def parse_toc(text):
+    entries = resolve_alpha_styles([entry for entry in map(parse_toc_line, text.split('\n')) if entry])
+    ranks = {}
+    for _, style, _ in entries:
+        ranks.setdefault(style, len(ranks))
+
+    toc = []
+    parents = []
+    for indent, style, title in entries:
+        rank = ranks[style]
+        while parents and (parents[-1][0] > indent or (parents[-1][0] == indent and parents[-1][1] >= rank)):
+            parents.pop()
+        parents.append((indent, rank))
+        toc.append((min(len(parents), GUIDE_MAX_HEADING_LEVEL), title))
+    return toc
+
+
+# Function to generate every chapter concurrently. Chapters are passed to on_chapter(index, chapter)
+# as they arrive (from the calling thread); without on_chapter they are returned in TOC order.
+def generate_chapters(titles, generate_chapter, max_concurrency=None, on_progress=None, on_chapter=None):
+    max_concurrency = max_concurrency or GUIDE_MAX_CONCURRENCY
+    chapters = [None] * len(titles) if on_chapter is None else None
+    if not titles:
+        return chapters
+    with ThreadPoolExecutor(max_workers=min(max_concurrency, len(titles))) as pool:
+        futures = {pool.submit(generate_chapter, title): i for i, title in enumerate(titles)}
+        for done, future in enumerate(as_completed(futures), start=1):
+            # Callbacks run in the calling thread so Streamlit elements can be updated
+            if on_chapter is None:
+                chapters[futures[future]] = future.result()
+            else:
+                on_chapter(futures[future], future.result())
+            if on_progress:
+                on_progress(done, len(titles))
+    return chapters
+
+
+class GuideBuilder:
+    # Chapters may arrive in any order, they are appended to the document as soon as
+    # every chapter before them is in, so only out-of-order chapters are held back
+    def __init__(self, toc):
+        # python-docx is only loaded once a guide is actually written
+        from docx import Document
+
+        self.toc = toc
+        self.document = Document()
+        self.next_index = 0
+        self.pending = {}
+
+    def add_chapter(self, index, text):
+        self.pending[index] = text
+        while self.next_index in self.pending:
+            level, title = self.toc[self.next_index]
+            self.document.add_heading(title, level=level)
+            self.document.add_paragraph(self.pending.pop(self.next_index))
+            self.next_index += 1
+
+    def is_complete(self):
+        return self.next_index == len(self.toc)
+
+    # Function to write the .docx straight to output (a path or a binary file), without a copy in memory
+    def save(self, output):
+        if not self.is_complete():
+            raise ValueError(f"Guide is missing chapters: {self.next_index} of {len(self.toc)} written")
+        self.document.save(output)
+        # The document tree is no longer needed once serialized
+        self.document = None
@@ -0,0 +1,319 @@
+import datetime
+import json
+
+from generation import build_itinerary_prompt
+from llm import RETRYABLE_ERRORS
+from llm_cache import get_response_cache, make_cache_key
+from routing import routed_completion, stale_answer
+
+# Structured itinerary: the model answers with JSON days (location, activities and transport legs), which are
+# validated and kept as a plan. Later changes regenerate only the affected days instead of the whole trip.
+
+TRANSPORT_MODES = ('walk', 'bike', 'car', 'taxi', 'bus', 'train', 'boat', 'ferry', 'flight', 'other')
+# Invalid answers are sent back to the model with the validation error this many times before giving up
+PLAN_REPAIR_ATTEMPTS = 1
+DAY_SCHEMA = ('{"day": 1, "country": "Thailand", "location": "city or area where the night is spent", '
+              '"summary": "one sentence", "activities": ["..."], '
+              '"transport": [{"from": "previous night\'s location", "to": "this day\'s location", "mode": "train", "hours": 5.5}]}')
+LEG_SCHEMA = '{"day": 4, "transport": [{"from": "...", "to": "...", "mode": "bus", "hours": 3}]}'
+
+
+# Function to get the date of every day of the trip, both ends included
+def trip_dates(start_date, end_date):
+    start = datetime.date.fromisoformat(str(start_date))
+    end = datetime.date.fromisoformat(str(end_date))
+    return [start + datetime.timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+# Function to write day numbers compactly, e.g. [1, 2, 3, 7] -> "1-3, 7"
+def format_day_numbers(day_numbers):
+    ranges = []
+    for number in sorted(day_numbers):
+        if ranges and number == ranges[-1][1] + 1:
+            ranges[-1][1] = number
+        else:
+            ranges.append([number, number])
+    return ', '.join(str(a) if a == b else f"{a}-{b}" for a, b in ranges)
+
+
+# Function to check whether two place names refer to the same place ("Bangkok" and "Bangkok, Thailand")
+def same_place(a, b):
+    a, b = a.casefold().strip(), b.casefold().strip()
+    return bool(a) and bool(b) and (a in b or b in a)
+
+
+# Function to get the JSON object out of a model answer (code fences and text around it are ignored)
+def parse_plan_json(text):
+    start, end = text.find('{'), text.rfind('}')
+    if start < 0 or end < start:
+        raise ValueError("the answer does not contain a JSON object")
+    try:
+        return json.loads(text[start:end + 1])
+    except ValueError as e:
+        raise ValueError(f"the answer is not valid JSON ({e})")
+
+
+def _text(day, key, number):
+    value = day.get(key)
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError(f"day {number}: '{key}' must be a non-empty string")
+    return value.strip()
+
+
+# Function to validate the transport legs of a day and return them normalized
+def validate_legs(legs, number):
+    if not isinstance(legs, list):
+        raise ValueError(f"day {number}: 'transport' must be a list")
+    valid = []
+    for leg in legs:
+        if not isinstance(leg, dict):
+            raise ValueError(f"day {number}: every transport leg must be an object")
+        mode = str(leg.get('mode', 'other')).lower().strip()
+        hours = leg.get('hours')
+        if hours is not None and (not isinstance(hours, (int, float)) or hours < 0):
+            raise ValueError(f"day {number}: transport 'hours' must be a positive number")
+        valid.append({
+            'from': _text(leg, 'from', number),
+            'to': _text(leg, 'to', number),
+            'mode': mode if mode in TRANSPORT_MODES else 'other',
+            'hours': hours
+        })
+    return valid
+
+
+# Function to validate one day and return it normalized, raises ValueError naming the day and the problem
+def validate_day(day):
+    if not isinstance(day, dict) or not isinstance(day.get('day'), int):
+        raise ValueError("every day must be an object with an integer 'day'")
+    number = day['day']
+    activities = day.get('activities', [])
+    if not isinstance(activities, list) or not all(isinstance(a, str) for a in activities):
+        raise ValueError(f"day {number}: 'activities' must be a list of strings")
+    return {
+        'day': number,
+        'country': _text(day, 'country', number),
+        'location': _text(day, 'location', number),
+        'summary': str(day.get('summary') or '').strip(),
+        'activities': [a.strip() for a in activities if a.strip()],
+        'transport': validate_legs(day.get('transport', []), number)
+    }
+
+
+# Function to validate an answer holding exactly the requested days; legs_only answers only carry transport
+def validate_days(data, day_numbers, legs_only=False):
+    if not isinstance(data, dict) or not isinstance(data.get('days'), list):
+        raise ValueError("the answer must be an object with a 'days' list")
+    days = []
+    for day in data['days']:
+        if legs_only:
+            if not isinstance(day, dict) or not isinstance(day.get('day'), int):
+                raise ValueError("every day must be an object with an integer 'day'")
+            days.append({'day': day['day'], 'transport': validate_legs(day.get('transport', []), day['day'])})
+        else:
+            days.append(validate_day(day))
+    numbers = [day['day'] for day in days]
+    if sorted(numbers) != sorted(day_numbers):
+        raise ValueError(f"expected days {format_day_numbers(day_numbers)}, got {format_day_numbers(numbers) or 'none'}")
+    return sorted(days, key=lambda day: day['day'])
+
+
+# Function to find the days whose location changes without transport legs leading there from the previous night
+def broken_transitions(days):
+    broken = []
+    for previous, day in zip(days, days[1:]):
+        if same_place(previous['location'], day['location']):
+            continue
+        legs = day['transport']
+        if not legs or not same_place(legs[0]['from'], previous['location']) or not same_place(legs[-1]['to'], day['location']):
+            broken.append(day['day'])
+    return broken
+
+
+# Function to write the plan as short lines (one per day), the context given when only some days are rewritten
+def plan_outline(days):
+    lines = []
+    for day in days:
+        line = f"Day {day['day']} ({day['date']}): {day['location']}, {day['country']}"
+        if day['summary']:
+            line += f" - {day['summary']}"
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+# Function to build the request for the whole plan
+def build_plan_request(dates):
+    return f"Write this itinerary as JSON. The trip has {len(dates)} days, day 1 is {dates[0]} and day {len(dates)} " \
+           f"is {dates[-1]}.\nDays to write: {format_day_numbers(range(1, len(dates) + 1))}\n" \
+           f"Each day looks like {DAY_SCHEMA}. 'transport' lists the legs travelled that day to reach its location " \
+           f"(empty when staying in the same place), modes are {', '.join(TRANSPORT_MODES)}.\n" \
+           "Answer with JSON only, in the form {\"days\": [...]}."
+
+
+# Function to build the request that rewrites some days of an existing plan, the other days are kept as they are
+def build_days_request(days, day_numbers, instructions, legs_only=False):
+    request = f"This is the current day by day plan:\n{plan_outline(days)}\n\n"
+    if legs_only:
+        request += "The places of the following days changed, only their transport legs have to be planned again, " \
+                   "from the previous night's location to the day's location.\n" \
+                   f"Days to write: {format_day_numbers(day_numbers)}\nEach day looks like {LEG_SCHEMA}, " \
+                   f"modes are {', '.join(TRANSPORT_MODES)}.\n"
+    else:
+        request += "Rewrite only the following days, keep every other day unchanged and make them fit between " \
+                   "the days around them.\n" \
+                   f"Days to write: {format_day_numbers(day_numbers)}\n"
+        if instructions:
+            request += f"Requested changes: {instructions}\n"
+        request += f"Each day looks like {DAY_SCHEMA}. 'transport' lists the legs travelled that day to reach its " \
+                   f"location (empty when staying in the same place), modes are {', '.join(TRANSPORT_MODES)}.\n"
+    return request + "Answer with JSON only, in the form {\"days\": [...]}."
+
+
+# Function to ask the model for some days and validate them. Answers are cached per request, an invalid
+# answer is sent back with the validation error; when every model fails the last cached answer is used.
+def request_days(site, request_messages, day_numbers, model, use_cache=True, legs_only=False):
+    cache_key = make_cache_key(model, request_messages)
+    cache = get_response_cache() if use_cache else None
+    if cache:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return validate_days(json.loads(cached), day_numbers, legs_only)
+
+    conversation = list(request_messages)
+    for attempt in range(PLAN_REPAIR_ATTEMPTS + 1):
+        try:
+            answer, answered_by = routed_completion(site, conversation, model=model, with_model=True)
+        except RETRYABLE_ERRORS:
+            stale = stale_answer(site, cache_key)
+            if stale is None:
+                raise
+            return validate_days(json.loads(stale), day_numbers, legs_only)
+        try:
+            days = validate_days(parse_plan_json(answer), day_numbers, legs_only)
+        except ValueError as e:
+            if attempt == PLAN_REPAIR_ATTEMPTS:
+                raise ValueError(f"The model did not return a valid itinerary: {e}")
+            conversation += [
+                {"role": "assistant", "content": answer},
+                {"role": "user", "content": f"That answer is not valid: {e}. Answer again with JSON only."}
+            ]
+            continue
+        if cache:
+            # Stored under the model that answered, a fallback answer is not reused as the chosen model's
+            cache.set(make_cache_key(answered_by, request_messages), json.dumps({'days': days}, ensure_ascii=False))
+        return days
+
+
+def _merge(plan, days, dates):
+    by_number = {day['day']: day for day in plan['days']}
+    for day in days:
+        by_number[day['day']] = dict(by_number.get(day['day'], {}), **day)
+    merged = [dict(by_number[number], date=dates[number - 1].isoformat()) for number in sorted(by_number)
+              if number <= len(dates)]
+    return dict(plan, days=merged)
+
+
+# Function to plan again the transport legs of the days no longer connected to the previous night
+def fix_transitions(plan, base_messages, model, use_cache=True, skip=()):
+    dates = trip_dates(plan['start_date'], plan['end_date'])
+    broken = [number for number in broken_transitions(plan['days']) if number not in skip]
+    if not broken:
+        return plan
+    request_messages = base_messages + [
+        {"role": "user", "content": build_days_request(plan['days'], broken, None, legs_only=True)}
+    ]
+    legs = request_days("itinerary_days", request_messages, broken, model, use_cache, legs_only=True)
+    return _merge(plan, legs, dates)
+
+
+# Function to generate the whole structured plan: {'start_date', 'end_date', 'countries', 'days': [...]}
+def generate_plan(messages, model, countries, start_date, end_date, use_cache=True):
+    dates = trip_dates(start_date, end_date)
+    if not dates:
+        raise ValueError("The trip ends before it starts")
+    base_messages = [{"role": "system", "content": build_itinerary_prompt(messages, countries)}]
+    request_messages = base_messages + [{"role": "user", "content": build_plan_request(dates)}]
+    days = request_days("itinerary", request_messages, list(range(1, len(dates) + 1)), model, use_cache)
+    plan = _merge({'start_date': dates[0].isoformat(), 'end_date': dates[-1].isoformat(),
+                   'countries': list(countries), 'days': []}, days, dates)
+    return fix_transitions(plan, base_messages, model, use_cache)
+
+
+# Function to regenerate only some days of a plan (changed or new ones), the other days are reused as they are.
+# Days that no longer connect to a regenerated neighbour only get their transport legs planned again.
+def regenerate_days(plan, day_numbers, instructions, messages, model, use_cache=True):
+    dates = trip_dates(plan['start_date'], plan['end_date'])
+    day_numbers = sorted(set(day_numbers))
+    if not day_numbers:
+        return plan
+    base_messages = [{"role": "system", "content": build_itinerary_prompt(messages, plan['countries'])}]
+    request_messages = base_messages + [
+        {"role": "user", "content": build_days_request(plan['days'], day_numbers, instructions)}
+    ]
+    days = request_days("itinerary_days", request_messages, day_numbers, model, use_cache)
+    plan = _merge(plan, days, dates)
+    return fix_transitions(plan, base_messages, model, use_cache, skip=day_numbers)
+
+
+# Function to find the countries of the trip that no day of the plan is spent in
+def missing_countries(plan, countries=None):
+    countries = plan['countries'] if countries is None else countries
+    return [country for country in countries if not any(same_place(day['country'], country) for day in plan['days'])]
+
+
+# Function to fit a plan to changed trip details. Returns the updated plan and the days that have to be
+# regenerated: days added by new dates, days spent in countries that were removed from the trip and, for
+# countries added since the plan was made that no day visits yet, enough days at the end of the trip to give
+# them their share of it. Those countries are kept in the plan's 'unplanned_countries' until a day visits them,
+# so they are asked for again if a regeneration leaves them out; regenerate with missing_days_instructions.
+# A plan is returned unchanged, with no days to regenerate, when the end date is before the start date.
+def reconcile_plan(plan, countries, start_date, end_date):
+    dates = trip_dates(start_date, end_date)
+    if not dates:
+        return plan, []
+    removed = [country for country in plan['countries'] if country not in countries]
+    added = [country for country in countries
+             if country not in plan['countries'] or country in plan.get('unplanned_countries', [])]
+    days = [dict(day, date=dates[day['day'] - 1].isoformat()) for day in plan['days'] if day['day'] <= len(dates)]
+    stale = [day['day'] for day in days if any(same_place(day['country'], country) for country in removed)]
+    planned = {day['day'] for day in days}
+    missing = [number for number in range(1, len(dates) + 1) if number not in planned]
+    affected = set(stale + missing)
+    unvisited = missing_countries({'days': days}, added)
+    if unvisited:
+        # Each country gets an equal share of the days; the missing ones take theirs from the end of the trip
+        share = round(len(dates) * len(unvisited) / len(countries))
+        for number in range(len(dates), 0, -1):
+            if len(affected) >= share:
+                break
+            affected.add(number)
+    plan = dict(plan, start_date=dates[0].isoformat(), end_date=dates[-1].isoformat(), countries=list(countries),
+                unplanned_countries=unvisited, days=days)
+    return plan, sorted(affected)
+
+
+# Function to build the instructions for regenerating the days found by reconcile_plan, None when no added
+# country is waiting for its days
+def missing_days_instructions(plan):
+    unvisited = missing_countries(plan, plan.get('unplanned_countries', []))
+    if not unvisited:
+        return None
+    return f"The trip now also goes to {', '.join(unvisited)}, which no day of the plan visits yet. " \
+           f"Spend the days to write there, travelling on from the day before."
+
+
+# Function to write one day of the plan as markdown: summary, activities and transport legs
+def day_markdown(day):
+    lines = [day['summary']] if day['summary'] else []
+    lines += [f"- {activity}" for activity in day['activities']]
+    for leg in day['transport']:
+        hours = f" ({leg['hours']:g} h)" if leg['hours'] is not None else ""
+        lines.append(f"- *{leg['mode'].capitalize()}: {leg['from']} → {leg['to']}{hours}*")
+    return '\n'.join(lines)
+
+
+# Function to write the whole plan as markdown, e.g. for a download
+def plan_markdown(plan):
+    parts = []
+    for day in plan['days']:
+        parts.append(f"### Day {day['day']} ({day['date']}): {day['location']}, {day['country']}\n{day_markdown(day)}")
+    return '\n\n'.join(parts)
@@ -0,0 +1,187 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger('travelai.jobs')
+
+# Long generations (itinerary, guide) run on a worker pool, their state and results are kept in SQLite
+JOBS_PATH = os.getenv('jobs_path', os.path.join('data', 'jobs.sqlite3'))
+JOB_WORKERS = int(os.getenv('job_workers', 4))
+JOB_RETENTION_SECONDS = float(os.getenv('job_retention_seconds', 24 * 3600))
+# Binary results (the .docx guides) are written here by the jobs, one file per job, and only their path is kept in SQLite
+JOB_FILES_DIR = os.getenv('job_files_dir', os.path.join('data', 'job_files'))
+# Partial results are written at most this often while a job is running
+JOB_PARTIAL_INTERVAL_SECONDS = 0.5
+# How often a page checks on a running job
+JOB_POLL_SECONDS = float(os.getenv('job_poll_seconds', 1.0))
+
+ACTIVE_STATUSES = ('queued', 'running')
+# The result is left out, it is read with get_result when it is shown
+JOB_COLUMNS = ('job_id', 'session_id', 'kind', 'status', 'progress', 'partial', 'error', 'created_at', 'updated_at')
+
+
+# Function to build the key that identifies identical jobs (same session, kind and inputs). Sessions never
+# share a job, so every job and its cost belong to the one session that listed it; the answers themselves
+# are still shared through the LLM cache.
+def make_job_key(session_id, kind, payload):
+    data = json.dumps({'session_id': session_id, 'kind': kind, 'payload': payload}, sort_keys=True,
+                      ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+class JobReporter:
+    # Handed to the job function so it can publish progress (0..1) and partial text while it runs
+    def __init__(self, queue, job_id):
+        self.queue = queue
+        self.job_id = job_id
+        self.result_path = None
+        self._last_partial = 0.0
+
+    # Function to get the file a job writes its binary result to, instead of returning it
+    def result_file(self):
+        os.makedirs(JOB_FILES_DIR, exist_ok=True)
+        self.result_path = os.path.join(JOB_FILES_DIR, self.job_id)
+        return self.result_path
+
+    def progress(self, value):
+        self.queue._update(self.job_id, progress=value)
+
+    def partial(self, text, force=False):
+        now = time.monotonic()
+        if force or now - self._last_partial >= JOB_PARTIAL_INTERVAL_SECONDS:
+            self._last_partial = now
+            self.queue._update(self.job_id, partial=text)
+
+
+class JobQueue:
+    def __init__(self, path=JOBS_PATH, workers=JOB_WORKERS):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, session_id TEXT NOT NULL, kind TEXT NOT NULL, job_key TEXT NOT NULL, "
+            "status TEXT NOT NULL, progress REAL NOT NULL DEFAULT 0, partial TEXT, result BLOB, result_path TEXT, "
+            "error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        if 'result_path' not in {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}:
+            self._db.execute("ALTER TABLE jobs ADD COLUMN result_path TEXT")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_key ON jobs (job_key, status)")
+        # Jobs left active by a previous process can no longer finish
+        self._db.execute(
+            "UPDATE jobs SET status = 'failed', error = 'Interrupted by a restart', updated_at = ? "
+            "WHERE status IN ('queued', 'running')", (time.time(),)
+        )
+
+    # Function to submit fn(reporter) for the session. An identical job of the session already queued or
+    # running (a double click, a rerun) is reused instead of starting a new one; fn returns the result text, or
+    # writes a binary result to reporter.result_file().
+    def submit(self, session_id, kind, payload, fn):
+        job_key = make_job_key(session_id, kind, payload)
+        now = time.time()
+        with self._lock:
+            expired = "status NOT IN ('queued', 'running') AND updated_at < ?"
+            paths = self._db.execute(
+                f"SELECT result_path FROM jobs WHERE {expired} AND result_path IS NOT NULL", (now - JOB_RETENTION_SECONDS,)
+            ).fetchall()
+            self._db.execute(f"DELETE FROM jobs WHERE {expired}", (now - JOB_RETENTION_SECONDS,))
+        for (path,) in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            row = self._db.execute(
+                "SELECT job_id FROM jobs WHERE job_key = ? AND status IN ('queued', 'running')", (job_key,)
+            ).fetchone()
+            if row is not None:
+                return row[0]
+            job_id = uuid.uuid4().hex
+            self._db.execute(
+                "INSERT INTO jobs (job_id, session_id, kind, job_key, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+                (job_id, session_id, kind, job_key, now, now)
+            )
+        self._pool.submit(self._run, job_id, fn)
+        return job_id
+
+    def _run(self, job_id, fn):
+        self._update(job_id, status='running')
+        reporter = JobReporter(self, job_id)
+        try:
+            result = fn(reporter)
+        except Exception as e:
+            logger.exception("Job %s failed", job_id)
+            if reporter.result_path and os.path.exists(reporter.result_path):
+                os.remove(reporter.result_path)
+            self._update(job_id, status='failed', error=str(e))
+            return
+        if reporter.result_path:
+            self._update(job_id, status='done', progress=1.0, result_path=reporter.result_path)
+        else:
+            self._update(job_id, status='done', progress=1.0, result=result)
+
+    def _update(self, job_id, **fields):
+        fields['updated_at'] = time.time()
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._db.execute(f"UPDATE jobs SET {assignments} WHERE job_id = ?", (*fields.values(), job_id))
+
+    # Function to get a job as a dict, or None if it does not exist (or belongs to another session)
+    def get(self, job_id, session_id=None):
+        with self._lock:
+            row = self._db.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(JOB_COLUMNS, row))
+        if session_id is not None and job['session_id'] != session_id:
+            return None
+        return job
+
+    # Function to get the result of a finished job (text, or bytes read back from its file), None if there is none
+    def get_result(self, job_id):
+        with self._lock:
+            row = self._db.execute("SELECT result, result_path FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        result, path = row
+        if path is None:
+            return result
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    # Function to list the jobs of a session, newest first
+    def list_jobs(self, session_id):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT job_id, kind, status, progress, created_at FROM jobs WHERE session_id = ? ORDER BY created_at DESC",
+                (session_id,)
+            ).fetchall()
+        return [dict(zip(('job_id', 'kind', 'status', 'progress', 'created_at'), row)) for row in rows]
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+# Function to get the process-wide job queue
+def get_job_queue():
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = JobQueue()
+    return _queue
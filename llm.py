@@ -0,0 +1,187 @@
+import os
+import random
+import threading
+import time
+
+import httpx
+from openai import APIConnectionError, APITimeoutError, DefaultHttpxClient, InternalServerError, OpenAI, RateLimitError, Timeout
+
+from metrics import record_llm_call
+
+# Errors worth retrying: rate limits and transient server/network failures
+RETRYABLE_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+LLM_MAX_RETRIES = int(os.getenv('llm_max_retries', 4))
+LLM_BACKOFF_SECONDS = float(os.getenv('llm_backoff_seconds', 1.0))
+LLM_MAX_BACKOFF_SECONDS = 30.0
+# Shortest request timeout given to an attempt, even when its budget is (almost) used up
+LLM_MIN_TIMEOUT_SECONDS = 0.1
+
+# Connection settings of the shared client (base URL can point at a local stand-in server)
+LLM_BASE_URL = os.getenv('openai_base_url') or None
+LLM_TIMEOUT_SECONDS = float(os.getenv('llm_timeout_seconds', 120))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv('llm_connect_timeout_seconds', 10))
+LLM_MAX_CONNECTIONS = int(os.getenv('llm_max_connections', 20))
+LLM_KEEPALIVE_SECONDS = float(os.getenv('llm_keepalive_seconds', 60))
+
+# Optional global cap on model requests per minute, shared by every thread (used by the batch mode)
+LLM_REQUESTS_PER_MINUTE = float(os.getenv('llm_requests_per_minute', 0))
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+class RateLimiter:
+    # Spaces requests evenly so that at most requests_per_minute start in any minute
+    def __init__(self, requests_per_minute):
+        self.interval = 60.0 / requests_per_minute
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+_rate_limiter = RateLimiter(LLM_REQUESTS_PER_MINUTE) if LLM_REQUESTS_PER_MINUTE > 0 else None
+
+
+# Function to set (or remove, with None/0) the global limit on model requests per minute
+def set_rate_limit(requests_per_minute):
+    global _rate_limiter
+    _rate_limiter = RateLimiter(requests_per_minute) if requests_per_minute else None
+
+
+# Function to build an OpenAI client with its own keep-alive connection pool
+def create_client(api_key, base_url=None):
+    http_client = DefaultHttpxClient(
+        timeout=Timeout(LLM_TIMEOUT_SECONDS, connect=LLM_CONNECT_TIMEOUT_SECONDS),
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_CONNECTIONS,
+            keepalive_expiry=LLM_KEEPALIVE_SECONDS
+        )
+    )
+    # Retries are handled by call_with_retry, so the SDK's own retry loop is turned off
+    return OpenAI(api_key=api_key, base_url=base_url, max_retries=0, http_client=http_client)
+
+
+# Function to get the process-wide client, shared by every Streamlit session and thread
+def get_client(api_key, base_url=None):
+    base_url = base_url or LLM_BASE_URL
+    key = (api_key, base_url)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = create_client(api_key, base_url)
+    return client
+
+
+# Function to read the server's Retry-After hint (in seconds) from an API error, if any
+def retry_after_seconds(error):
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+# Function to call the OpenAI API with exponential backoff (and jitter) on rate limits.
+# budget (seconds) bounds the whole call, counted from the moment the first request gets its rate limiter
+# slot so the wait in the local queue does not use it up. Each attempt's timeout is the time left, a timed
+# out attempt is not retried, and the last error is raised when a retry could not be sent before the deadline
+def call_with_retry(fn, *args, retries=None, backoff=None, budget=None, **kwargs):
+    retries = LLM_MAX_RETRIES if retries is None else retries
+    backoff = LLM_BACKOFF_SECONDS if backoff is None else backoff
+    deadline = None
+    error = None
+    for attempt in range(retries + 1):
+        if _rate_limiter:
+            _rate_limiter.acquire()
+        if budget is not None:
+            if deadline is None:
+                deadline = time.monotonic() + budget
+            elif time.monotonic() >= deadline:
+                # The retry's rate limiter slot came too late, it is not sent
+                raise error
+            kwargs['timeout'] = max(deadline - time.monotonic(), LLM_MIN_TIMEOUT_SECONDS)
+        try:
+            return fn(*args, **kwargs)
+        except RETRYABLE_ERRORS as e:
+            error = e
+            if attempt == retries or (deadline is not None and isinstance(e, APITimeoutError)):
+                raise
+            delay = retry_after_seconds(e)
+            if delay is None:
+                delay = min(backoff * 2 ** attempt, LLM_MAX_BACKOFF_SECONDS) * (0.5 + random.random() / 2)
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                raise
+            time.sleep(delay)
+
+
+# Function to turn a streamed chat completion into a generator of text chunks
+def iter_stream_text(stream):
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+# Function to pass a streamed completion through while recording time to first token and token usage
+def measure_stream(stream, site, model, start):
+    first_token = None
+    usage = None
+    try:
+        for chunk in stream:
+            if first_token is None and chunk.choices and chunk.choices[0].delta.content:
+                first_token = time.perf_counter() - start
+            if getattr(chunk, 'usage', None):
+                usage = chunk.usage
+            yield chunk
+    except Exception as e:
+        record_llm_call(site, model, time.perf_counter() - start, first_token, error=e)
+        raise
+    record_llm_call(
+        site, model, time.perf_counter() - start, first_token,
+        usage.prompt_tokens if usage else None,
+        usage.completion_tokens if usage else None
+    )
+
+
+# Function to create a chat completion (with retries, within the budget if given) and record its latency,
+# tokens and errors under a call site. The latency is counted from the first request sent, not from the
+# wait for a rate limiter slot
+def create_chat_completion(client, site, retries=None, budget=None, **params):
+    model = params.get('model')
+    if params.get('stream'):
+        params.setdefault('stream_options', {'include_usage': True})
+    sent = []
+
+    def send(**request):
+        if not sent:
+            sent.append(time.perf_counter())
+        return client.chat.completions.create(**request)
+
+    try:
+        response = call_with_retry(send, retries=retries, budget=budget, **params)
+    except Exception as e:
+        record_llm_call(site, model, time.perf_counter() - sent[0] if sent else 0.0, error=e)
+        raise
+    start = sent[0]
+    if params.get('stream'):
+        return measure_stream(response, site, model, start)
+    wall = time.perf_counter() - start
+    usage = response.usage
+    record_llm_call(
+        site, model, wall, wall,
+        usage.prompt_tokens if usage else None,
+        usage.completion_tokens if usage else None
+    )
+    return response
@@ -0,0 +1,179 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger('travelai.metrics')
+
+# How many recent LLM calls and page renders are kept in memory for the diagnostics page
+METRICS_MAX_RECORDS = int(os.getenv('metrics_max_records', 5000))
+PERCENTILES = (50, 90, 99)
+# Level of the travelai.* loggers; the metrics log (one JSON object per line) goes to stderr unless a file is given
+LOG_LEVEL = os.getenv('log_level', 'INFO').upper()
+METRICS_LOG_PATH = os.getenv('metrics_log_path')
+
+_llm_calls = deque(maxlen=METRICS_MAX_RECORDS)
+_page_renders = deque(maxlen=METRICS_MAX_RECORDS)
+_totals = {}
+_lock = threading.Lock()
+
+
+# Function to attach the handlers of the travelai.* loggers: JSON lines for travelai.metrics, and
+# "time level logger: message" lines for the others (jobs, sessions). Safe to call on every script run.
+def configure_logging():
+    app_logger = logging.getLogger('travelai')
+    app_logger.setLevel(LOG_LEVEL)
+    if not app_logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+        app_logger.addHandler(handler)
+        # Records are written once here, not again by a handler of the root logger
+        app_logger.propagate = False
+    if not logger.handlers:
+        handler = logging.FileHandler(METRICS_LOG_PATH, encoding='utf-8') if METRICS_LOG_PATH else logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.propagate = False
+
+
+def _count(name, labels, value=1):
+    key = (name, tuple(sorted(labels.items())))
+    _totals[key] = _totals.get(key, 0) + value
+
+
+# Function to record one model call (site is chat, itinerary, toc, chapter, ...)
+def record_llm_call(site, model, wall_seconds, ttft_seconds=None, prompt_tokens=None, completion_tokens=None, error=None):
+    record = {
+        'event': 'llm_call',
+        'time': time.time(),
+        'site': site,
+        'model': model,
+        'wall_seconds': round(wall_seconds, 4),
+        'ttft_seconds': None if ttft_seconds is None else round(ttft_seconds, 4),
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'error': None if error is None else type(error).__name__
+    }
+    labels = {'site': site, 'model': model}
+    with _lock:
+        _llm_calls.append(record)
+        _count('travelai_llm_calls_total', labels)
+        _count('travelai_llm_prompt_tokens_total', labels, prompt_tokens or 0)
+        _count('travelai_llm_completion_tokens_total', labels, completion_tokens or 0)
+        if error is not None:
+            _count('travelai_llm_errors_total', dict(labels, error=record['error']))
+    if error is None:
+        logger.info(json.dumps(record))
+    else:
+        logger.warning(json.dumps(dict(record, message=str(error))))
+
+
+# Function to record a routing decision for a call site (fallback, hedge or stale_cache)
+def record_route_event(site, model, event):
+    record = {'event': 'route', 'time': time.time(), 'site': site, 'model': model, 'route_event': event}
+    with _lock:
+        _count('travelai_llm_route_events_total', {'site': site, 'model': model, 'event': event})
+    logger.info(json.dumps(record))
+
+
+# Function to record how long a page function took to run
+def record_page_render(page, seconds, error=None):
+    record = {'event': 'page_render', 'time': time.time(), 'page': page, 'seconds': round(seconds, 4),
+              'error': None if error is None else type(error).__name__}
+    with _lock:
+        _page_renders.append(record)
+        _count('travelai_page_renders_total', {'page': page})
+    logger.info(json.dumps(record))
+
+
+# Context manager to time a page function
+@contextmanager
+def measure_page(page):
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        record_page_render(page, time.perf_counter() - start, error=e)
+        raise
+    record_page_render(page, time.perf_counter() - start)
+
+
+# Function to get copies of the recorded LLM calls and page renders
+def get_records():
+    with _lock:
+        return list(_llm_calls), list(_page_renders)
+
+
+def _percentiles(values):
+    if not values:
+        return {p: None for p in PERCENTILES}
+    # numpy is only needed once someone looks at the metrics, not on every page render
+    import numpy as np
+
+    return dict(zip(PERCENTILES, np.percentile(values, PERCENTILES).tolist()))
+
+
+# Function to summarize the records per group: count, errors, tokens and latency percentiles
+def summarize_llm_calls(calls=None):
+    calls = get_records()[0] if calls is None else calls
+    groups = {}
+    for call in calls:
+        groups.setdefault((call['site'], call['model']), []).append(call)
+    rows = []
+    for (site, model), group in sorted(groups.items()):
+        wall = _percentiles([c['wall_seconds'] for c in group])
+        ttft = _percentiles([c['ttft_seconds'] for c in group if c['ttft_seconds'] is not None])
+        row = {
+            'site': site,
+            'model': model,
+            'calls': len(group),
+            'errors': sum(1 for c in group if c['error']),
+            'prompt_tokens': sum(c['prompt_tokens'] or 0 for c in group),
+            'completion_tokens': sum(c['completion_tokens'] or 0 for c in group)
+        }
+        row.update({f'wall_p{p}': wall[p] for p in PERCENTILES})
+        row.update({f'ttft_p{p}': ttft[p] for p in PERCENTILES})
+        rows.append(row)
+    return rows
+
+
+# Function to summarize page render times per page
+def summarize_page_renders(renders=None):
+    renders = get_records()[1] if renders is None else renders
+    groups = {}
+    for render in renders:
+        groups.setdefault(render['page'], []).append(render['seconds'])
+    rows = []
+    for page, seconds in sorted(groups.items()):
+        row = {'page': page, 'renders': len(seconds)}
+        row.update({f'p{p}': value for p, value in _percentiles(seconds).items()})
+        rows.append(row)
+    return rows
+
+
+def _labels(labels):
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+# Function to export the metrics in the Prometheus text format. It is only shown on the diagnostics page,
+# no endpoint serves it for scraping
+def prometheus_text():
+    calls, renders = get_records()
+    with _lock:
+        totals = sorted(_totals.items())
+    lines = []
+    for (name, labels), value in totals:
+        lines.append(f'{name}{_labels(labels)} {value}')
+    for row in summarize_llm_calls(calls):
+        labels = (('model', row['model']), ('site', row['site']))
+        for metric, prefix in (('travelai_llm_latency_seconds', 'wall'), ('travelai_llm_ttft_seconds', 'ttft')):
+            for p in PERCENTILES:
+                if row[f'{prefix}_p{p}'] is not None:
+                    lines.append(f'{metric}{_labels(labels + (("quantile", p / 100),))} {row[f"{prefix}_p{p}"]:.4f}')
+    for row in summarize_page_renders(renders):
+        for p in PERCENTILES:
+            lines.append(f'travelai_page_render_seconds{_labels((("page", row["page"]), ("quantile", p / 100)))} {row[f"p{p}"]:.4f}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,112 @@
+import csv
+import io
+from dataclasses import asdict
+
+from session_store import Participant
+
+GENDERS = ('Male', 'Female', 'Other')
+PREFERENCES = ('Adventure', 'Relax', 'Culture')
+PARTICIPANT_FIELDS = ('name', 'age', 'gender', 'preference', 'additional_preferences')
+# Values used for the fields left empty, only the name is required
+PARTICIPANT_DEFAULTS = {'age': 30, 'gender': 'Other', 'preference': 'Culture', 'additional_preferences': ''}
+MAX_PARTICIPANTS = 100
+# Other CSV headers accepted for the fields
+CSV_HEADER_ALIASES = {
+    'vacation_preference': 'preference',
+    'preferences': 'preference',
+    'notes': 'additional_preferences',
+    'additional_notes': 'additional_preferences'
+}
+
+
+def _is_empty(value):
+    # None, NaN (empty cells of a table) and blank strings
+    return value is None or value != value or not str(value).strip()
+
+
+def _choice(value, options, default, field):
+    if _is_empty(value):
+        return default
+    for option in options:
+        if option.casefold() == str(value).strip().casefold():
+            return option
+    raise ValueError(f"{field} must be one of {', '.join(options)}")
+
+
+# Function to check the values of one participant and return the record, raises ValueError with the problem
+def validate_participant(data):
+    if _is_empty(data.get('name')):
+        raise ValueError("a name is required")
+    age = data.get('age')
+    if _is_empty(age):
+        age = PARTICIPANT_DEFAULTS['age']
+    try:
+        age = int(float(age))
+    except (TypeError, ValueError):
+        raise ValueError(f"age must be a number, not {age!r}")
+    if not 0 <= age <= 120:
+        raise ValueError("age must be between 0 and 120")
+    notes = data.get('additional_preferences')
+    return Participant(
+        name=str(data['name']).strip(),
+        age=age,
+        gender=_choice(data.get('gender'), GENDERS, PARTICIPANT_DEFAULTS['gender'], 'gender'),
+        preference=_choice(data.get('preference'), PREFERENCES, PARTICIPANT_DEFAULTS['preference'], 'preference'),
+        additional_preferences='' if _is_empty(notes) else str(notes).strip()
+    )
+
+
+# Function to apply the changes of a table editor (edited, added and deleted rows, by row position) to the
+# participants. Only the rows that changed are validated; a row that fails keeps its previous values.
+# Returns the new list and the problems found, as "Participant N: ..." messages.
+def apply_participant_changes(participants, edited_rows, added_rows, deleted_rows):
+    participants = list(participants)
+    errors = []
+    for index, changes in sorted(edited_rows.items(), key=lambda item: int(item[0])):
+        index = int(index)
+        try:
+            participants[index] = validate_participant(dict(asdict(participants[index]), **changes))
+        except ValueError as e:
+            errors.append(f"Participant {index + 1}: {e}")
+    deleted = {int(index) for index in deleted_rows}
+    participants = [p for index, p in enumerate(participants) if index not in deleted]
+    for number, row in enumerate(added_rows, start=1):
+        if all(_is_empty(value) for value in row.values()):
+            continue
+        try:
+            participants.append(validate_participant(row))
+        except ValueError as e:
+            errors.append(f"New row {number}: {e}")
+    return limit_participants(participants, errors)
+
+
+# Function to keep at most MAX_PARTICIPANTS participants, the ones dropped are reported in errors
+def limit_participants(participants, errors):
+    if len(participants) > MAX_PARTICIPANTS:
+        errors.append(f"Only the first {MAX_PARTICIPANTS} participants are kept")
+    return participants[:MAX_PARTICIPANTS], errors
+
+
+# Function to read participants from CSV text with a header row (name, age, gender, preference,
+# additional_preferences; only name is required). Returns the valid participants and the problems by line.
+def read_participants_csv(text):
+    reader = csv.DictReader(io.StringIO(text.lstrip('\ufeff')))
+    if not reader.fieldnames:
+        return [], ["the file is empty"]
+    headers = {}
+    for header in reader.fieldnames:
+        key = (header or '').strip().lower().replace(' ', '_')
+        headers[header] = CSV_HEADER_ALIASES.get(key, key)
+    if 'name' not in headers.values():
+        return [], ["the file needs a 'name' column"]
+
+    participants, errors = [], []
+    for line_number, row in enumerate(reader, start=2):
+        data = {headers[key]: value for key, value in row.items() if key in headers}
+        if all(_is_empty(value) for value in data.values()):
+            continue
+        try:
+            participants.append(validate_participant(data))
+        except ValueError as e:
+            errors.append(f"line {line_number}: {e}")
+    return participants, errors
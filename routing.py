@@ -0,0 +1,109 @@
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from llm import RETRYABLE_ERRORS, create_chat_completion, get_client, iter_stream_text
+from llm_cache import get_response_cache
+from metrics import record_route_event
+
+# Model tiers: the fast one for short, latency-sensitive calls, the strong one for the final itinerary
+FAST_MODEL = os.getenv('llm_fast_model', 'gpt-3.5-turbo')
+STRONG_MODEL = os.getenv('llm_strong_model', 'gpt-4')
+
+# Per call site policy:
+# - models: tried in order, the next one is used when a call fails or runs over its budget
+# - budget_seconds: latency budget of each model tier. Its attempts, their backoff and their timeouts all fit
+#   in it (for streams, up to the start of the response); a timed out attempt is not retried, the next tier
+#   is tried as soon as the budget runs out
+# - retries: retries of the same model before falling back, while the budget lasts
+# - hedge_after_seconds: if set, a duplicate request is sent when the first one is still running after
+#   this long, and the first answer wins (not used for streamed calls)
+# - params: sampling parameters of the call site
+ROUTE_POLICIES = {
+    'chat': {'models': [FAST_MODEL], 'budget_seconds': 20, 'retries': 1, 'hedge_after_seconds': None, 'params': {}},
+    'summary': {'models': [FAST_MODEL], 'budget_seconds': 30, 'retries': 1, 'hedge_after_seconds': None,
+                'params': {'temperature': 0}},
+    'toc': {'models': [FAST_MODEL, STRONG_MODEL], 'budget_seconds': 30, 'retries': 1, 'hedge_after_seconds': None,
+            'params': {'temperature': 0.2, 'max_tokens': 512, 'frequency_penalty': 0.0}},
+    'chapter': {'models': [STRONG_MODEL, FAST_MODEL], 'budget_seconds': 60, 'retries': 2, 'hedge_after_seconds': None,
+                'params': {'temperature': 0.2, 'max_tokens': 256, 'frequency_penalty': 0.0}},
+    'itinerary': {'models': [STRONG_MODEL, FAST_MODEL], 'budget_seconds': 120, 'retries': 2, 'hedge_after_seconds': None,
+                  'params': {}},
+    'itinerary_days': {'models': [STRONG_MODEL, FAST_MODEL], 'budget_seconds': 60, 'retries': 2, 'hedge_after_seconds': None,
+                       'params': {'temperature': 0.2}},
+}
+
+openai_api_key = os.getenv('openai_api_key')
+
+_hedge_pool = ThreadPoolExecutor(max_workers=int(os.getenv('llm_hedge_workers', 8)), thread_name_prefix='hedge')
+_policies_lock = threading.Lock()
+
+
+# Function to change the policy of a call site, e.g. configure_route('chat', hedge_after_seconds=3)
+def configure_route(site, **changes):
+    with _policies_lock:
+        ROUTE_POLICIES[site] = dict(ROUTE_POLICIES[site], **changes)
+
+
+# Function to get the policy of a call site; model, when given, replaces the first tier (the user's choice)
+def get_route(site, model=None):
+    route = dict(ROUTE_POLICIES[site])
+    if model:
+        route['models'] = [model] + [m for m in route['models'][1:] if m != model]
+    return route
+
+
+# Function to run fn, sending a duplicate request if it has not answered after hedge_after seconds
+def hedged_call(fn, hedge_after, site, model):
+    first = _hedge_pool.submit(fn)
+    done, _ = wait([first], timeout=hedge_after)
+    if done:
+        return first.result()
+    record_route_event(site, model, 'hedge')
+    pending = {first, _hedge_pool.submit(fn)}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+    return first.result()
+
+
+# Function to run a chat completion for a call site following its policy. Returns the text, or a generator
+# of text chunks when stream is True; with with_model, a (text or generator, model that answered) pair, so
+# answers of a fallback tier can be cached under their own model. Raises the last error when every tier failed.
+def routed_completion(site, messages, model=None, stream=False, with_model=False, **params):
+    route = get_route(site, model)
+    params = dict(route['params'], **params)
+    client = get_client(openai_api_key)
+    error = None
+    for i, tier_model in enumerate(route['models']):
+        if i:
+            record_route_event(site, tier_model, 'fallback')
+
+        def call():
+            return create_chat_completion(
+                client, site, retries=route['retries'], budget=route['budget_seconds'],
+                model=tier_model, messages=messages, stream=stream, **params
+            )
+
+        try:
+            if stream:
+                answer = iter_stream_text(call())
+            elif route['hedge_after_seconds']:
+                answer = hedged_call(call, route['hedge_after_seconds'], site, tier_model).choices[0].message.content
+            else:
+                answer = call().choices[0].message.content
+            return (answer, tier_model) if with_model else answer
+        except RETRYABLE_ERRORS as e:
+            error = e
+    raise error
+
+
+# Function to get the last cached answer for a call site whose model tiers all failed, even if it has expired
+def stale_answer(site, cache_key):
+    cache = get_response_cache()
+    stale = cache.get_stale(cache_key) if cache else None
+    if stale is not None:
+        record_route_event(site, None, 'stale_cache')
+    return stale
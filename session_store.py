@@ -0,0 +1,280 @@
+import datetime
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field, fields
+
+logger = logging.getLogger('travelai.sessions')
+
+# Trip details, participants and the chat of every session are kept here instead of st.session_state.
+# Sessions in use stay in memory; idle ones are written to the store and dropped, and loaded back on return.
+SESSION_STORE = os.getenv('session_store', 'sqlite')
+SESSION_STORE_PATH = os.getenv('session_store_path', os.path.join('data', 'sessions.sqlite3'))
+# A session not used for this long is moved out of memory
+SESSION_IDLE_SECONDS = float(os.getenv('session_idle_seconds', 10 * 60))
+# Above this many sessions in memory, the least recently used ones are moved out even if they are not idle
+SESSION_MAX_LIVE = int(os.getenv('session_max_live', 500))
+# Sessions hold the travellers' names, ages and notes and the whole chat, and anyone with a session's URL
+# can open it (see SESSION_RESUME_FROM_URL), so stored sessions are deleted after a day without use
+SESSION_RETENTION_SECONDS = float(os.getenv('session_retention_seconds', 24 * 3600))
+# The session id is kept in the ?session= URL parameter so a reload, or the app after a restart, resumes the
+# session and its jobs. The URL is then the only credential of the session: a copied or shared link opens
+# (and edits) it. Set to 0 to keep sessions to the browser tab instead; nothing is resumed after a reload.
+SESSION_RESUME_FROM_URL = os.getenv('session_resume_from_url', '1') not in ('0', 'false', 'False')
+# How often the sessions in memory are checked for idle ones
+SESSION_SWEEP_SECONDS = 30.0
+
+
+@dataclass(slots=True)
+class Participant:
+    name: str
+    age: int
+    gender: str
+    preference: str
+    additional_preferences: str = ''
+
+    # Read access by key, so records can be passed where participant dicts are expected
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+
+@dataclass(slots=True)
+class Message:
+    role: str
+    content: str
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+
+@dataclass(slots=True)
+class SessionData:
+    # Trip details chosen on page 1
+    gpt_version: str = '3.5'
+    start_date: datetime.date = datetime.date(2023, 12, 7)
+    end_date: datetime.date = datetime.date(2024, 1, 7)
+    selected_countries: list = field(default_factory=lambda: ['Thailand', 'Laos'])
+    num_people: int = 1
+    stream_responses: bool = True
+    participants: list = field(default_factory=list)
+    # Chat with the travel agent and the running summary of its older turns (see chat_context)
+    messages: list = field(default_factory=list)
+    chat_summary: dict = None
+    # Structured itinerary and the job it was loaded from
+    itinerary_plan: dict = None
+    itinerary_plan_job: str = None
+
+
+# Function to turn chat messages (records or dicts) into the plain dicts sent to the API
+def message_dicts(messages):
+    return [{'role': msg['role'], 'content': msg['content']} for msg in messages]
+
+
+# Function to serialize a session to compressed JSON
+def dump_session(session):
+    return zlib.compress(json.dumps(asdict(session), default=str, ensure_ascii=False).encode('utf-8'))
+
+
+# Function to rebuild a session from dump_session's output, unknown keys (from newer versions) are ignored
+def load_session(blob):
+    data = json.loads(zlib.decompress(blob))
+    data['participants'] = [Participant(**p) for p in data.get('participants', [])]
+    data['messages'] = [Message(**m) for m in data.get('messages', [])]
+    for key in ('start_date', 'end_date'):
+        if key in data:
+            data[key] = datetime.date.fromisoformat(data[key])
+    names = {f.name for f in fields(SessionData)}
+    return SessionData(**{key: value for key, value in data.items() if key in names})
+
+
+class SessionStore:
+    # Where idle sessions are written, as opaque bytes. Implement these methods to keep them somewhere
+    # else (Redis, files, ...) and pass the store to SessionManager or register it in SESSION_STORES.
+    def load(self, session_id):
+        raise NotImplementedError
+
+    def save(self, session_id, blob):
+        raise NotImplementedError
+
+    def delete(self, session_id):
+        raise NotImplementedError
+
+    # Function to delete the sessions not saved since the given time
+    def prune(self, older_than):
+        raise NotImplementedError
+
+    def count(self):
+        raise NotImplementedError
+
+
+class SQLiteSessionStore(SessionStore):
+    def __init__(self, path=SESSION_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, data BLOB NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)")
+
+    def load(self, session_id):
+        with self._lock:
+            row = self._db.execute("SELECT data FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return None if row is None else row[0]
+
+    def save(self, session_id, blob):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, data, updated_at) VALUES (?, ?, ?)",
+                (session_id, blob, time.time())
+            )
+
+    def delete(self, session_id):
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def prune(self, older_than):
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE updated_at < ?", (older_than,))
+
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+class MemorySessionStore(SessionStore):
+    # Keeps the serialized sessions in a dict: nothing survives a restart, but idle sessions still take
+    # a fraction of their live size. Used by the benchmarks.
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def load(self, session_id):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+        return None if entry is None else entry[0]
+
+    def save(self, session_id, blob):
+        with self._lock:
+            self._sessions[session_id] = (blob, time.time())
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def prune(self, older_than):
+        with self._lock:
+            for session_id in [key for key, (_, saved_at) in self._sessions.items() if saved_at < older_than]:
+                del self._sessions[session_id]
+
+    def count(self):
+        with self._lock:
+            return len(self._sessions)
+
+
+SESSION_STORES = {'sqlite': SQLiteSessionStore, 'memory': MemorySessionStore}
+
+
+class SessionManager:
+    def __init__(self, store, idle_seconds=SESSION_IDLE_SECONDS, max_live=SESSION_MAX_LIVE):
+        self.store = store
+        self.idle_seconds = idle_seconds
+        self.max_live = max_live
+        self.loads = 0
+        self.evictions = 0
+        # Sessions in memory, least recently used first, with their last use and the digest of their saved version
+        self._live = OrderedDict()
+        self._last_used = {}
+        self._saved = {}
+        self._session_locks = {}
+        self._lock = threading.RLock()
+        self._last_sweep = time.monotonic()
+
+    # Function to get a session, loaded from the store if it was moved out of memory (or new if unknown)
+    def get(self, session_id):
+        with self._lock:
+            session = self._live.get(session_id)
+            if session is None:
+                blob = self.store.load(session_id)
+                if blob is not None:
+                    self.loads += 1
+                session = SessionData() if blob is None else load_session(blob)
+                self._live[session_id] = session
+                self._saved[session_id] = None if blob is None else hashlib.sha1(blob).digest()
+            self._live.move_to_end(session_id)
+            self._last_used[session_id] = time.monotonic()
+            self._sweep(keep=session_id)
+            return session
+
+    # Function to get the lock of a session, held for a whole script run so two tabs open on the same
+    # session URL change it one after the other
+    def lock(self, session_id):
+        with self._lock:
+            return self._session_locks.setdefault(session_id, threading.RLock())
+
+    # Function to write a session to the store, skipped when nothing changed since it was last written
+    def save(self, session_id, session):
+        blob = dump_session(session)
+        digest = hashlib.sha1(blob).digest()
+        with self._lock:
+            if self._saved.get(session_id) == digest:
+                return
+        self.store.save(session_id, blob)
+        with self._lock:
+            self._saved[session_id] = digest
+
+    # Function to write a session to the store and drop it from memory
+    def evict(self, session_id):
+        with self._lock:
+            session = self._live.pop(session_id, None)
+            if session is None:
+                return
+            self.save(session_id, session)
+            self._last_used.pop(session_id, None)
+            self._saved.pop(session_id, None)
+            self._session_locks.pop(session_id, None)
+            self.evictions += 1
+
+    def _sweep(self, keep):
+        now = time.monotonic()
+        if now - self._last_sweep < SESSION_SWEEP_SECONDS and len(self._live) <= self.max_live:
+            return
+        self._last_sweep = now
+        # The oldest sessions come first, the sweep stops at the first one that stays. The session being
+        # fetched is always kept, it is about to be used.
+        for session_id in list(self._live):
+            if session_id == keep or (len(self._live) <= self.max_live and now - self._last_used[session_id] <= self.idle_seconds):
+                break
+            self.evict(session_id)
+        try:
+            self.store.prune(time.time() - SESSION_RETENTION_SECONDS)
+        except Exception:
+            logger.exception("Pruning the session store failed")
+
+    def stats(self):
+        with self._lock:
+            live = len(self._live)
+        return {'live': live, 'stored': self.store.count(), 'loads': self.loads, 'evictions': self.evictions}
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+# Function to get the process-wide session manager, backed by the store named in the session_store setting
+def get_session_manager():
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = SessionManager(SESSION_STORES[SESSION_STORE]())
+    return _manager
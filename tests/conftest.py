@@ -0,0 +1,29 @@
+import pytest
+
+import generation
+import itinerary_plan
+import llm
+import routing
+from benchmarks.fake_openai_server import start_fake_server
+from llm_cache import ResponseCache
+
+
+# Local chat completions server the model calls are sent to; change server.config to shape its answers
+@pytest.fixture
+def fake_server(monkeypatch):
+    server = start_fake_server(latency=0.0, token_rate=0.0, reply_tokens=5)
+    monkeypatch.setattr(llm, 'LLM_BASE_URL', server.base_url)
+    monkeypatch.setattr(llm, 'LLM_BACKOFF_SECONDS', 0.01)
+    monkeypatch.setattr(routing, 'openai_api_key', 'test')
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+# Response cache in a temporary file, used by the generation functions instead of the process-wide one
+@pytest.fixture
+def response_cache(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path / 'llm_cache.sqlite3'))
+    for module in (generation, itinerary_plan, routing):
+        monkeypatch.setattr(module, 'get_response_cache', lambda: cache)
+    return cache
@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from batch import read_checkpoint, read_specs, run_batch, spec_id
+from routing import FAST_MODEL, STRONG_MODEL
+
+
+def spec(trip_id, **changes):
+    return dict({'id': trip_id, 'countries': ['Thailand'], 'start_date': '2024-12-07', 'end_date': '2024-12-10',
+                 'participants': [{'name': 'Ann', 'age': 34}]}, **changes)
+
+
+def write_lines(path, lines):
+    path.write_text(''.join(line + '\n' for line in lines), encoding='utf-8')
+    return str(path)
+
+
+# Function to get specs the way the command line reads them, with the participant defaults filled in
+def load_specs(tmp_path, specs):
+    return read_specs(write_lines(tmp_path / 'specs.jsonl', [json.dumps(spec) for spec in specs]))
+
+
+def read_records(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_read_specs_fills_participant_defaults(tmp_path):
+    path = write_lines(tmp_path / 'specs.jsonl', [json.dumps(spec('a')), '', json.dumps(spec(None))])
+    specs = read_specs(path)
+    assert len(specs) == 2
+    assert specs[0]['participants'][0]['name'] == 'Ann' and specs[0]['participants'][0]['gender']
+    # Specs without an id get one derived from their content
+    assert spec_id(specs[1]) == spec_id(dict(specs[1]))
+
+
+@pytest.mark.parametrize('line, error', [
+    ('{"id": ', ':1: invalid JSON'),
+    (json.dumps({'id': 'a', 'countries': ['Laos']}), ':1: missing start_date, end_date, participants'),
+    (json.dumps(spec('a', participants={'name': 'Ann'})), ':1: participants must be a list'),
+    (json.dumps(spec('a', participants=[{'name': 'Ann'}, 'Bob'])), ':1: participant 2: must be an object'),
+    (json.dumps(spec('a', participants=[{'age': 30}])), ':1: participant 1: '),
+])
+def test_read_specs_reports_the_invalid_line(tmp_path, line, error):
+    path = write_lines(tmp_path / 'specs.jsonl', [line])
+    with pytest.raises(ValueError, match=error):
+        read_specs(path)
+
+
+def test_read_checkpoint_skips_failed_and_truncated_records(tmp_path):
+    path = write_lines(tmp_path / 'out.jsonl', [json.dumps({'id': 'a', 'status': 'done'}),
+                                                json.dumps({'id': 'b', 'status': 'failed'}), '{"id": "c", "sta'])
+    assert read_checkpoint(path) == {'a'}
+    assert read_checkpoint(str(tmp_path / 'missing.jsonl')) == set()
+
+
+def test_run_batch_resumes_from_the_output(tmp_path, fake_server, response_cache):
+    output = str(tmp_path / 'out.jsonl')
+    docx_dir = str(tmp_path / 'guides')
+    specs = load_specs(tmp_path, [spec('a'), spec('b', countries=['Laos'])])
+
+    # Every model fails for the first run, so both specs are recorded as failed
+    fake_server.config['failing_models'] = {STRONG_MODEL, FAST_MODEL}
+    assert run_batch(specs, output, docx_dir, concurrency=2, with_guide=False) == 2
+    assert {record['id']: record['status'] for record in read_records(output)} == {'a': 'failed', 'b': 'failed'}
+
+    # The failed specs are run again
+    fake_server.config['failing_models'] = set()
+    assert run_batch(specs, output, docx_dir, concurrency=2, with_guide=False) == 0
+    done = [record for record in read_records(output) if record['status'] == 'done']
+    assert sorted(record['id'] for record in done) == ['a', 'b']
+    assert all(record['itinerary'].startswith('word0') for record in done)
+
+    # Finished specs are not run a third time, only the new one is
+    calls = sum(fake_server.calls.values())
+    assert run_batch(specs + load_specs(tmp_path, [spec('c', countries=['Vietnam'])]), output, docx_dir, with_guide=False) == 0
+    assert [record['id'] for record in read_records(output)][-1] == 'c'
+    assert sum(fake_server.calls.values()) == calls + 1
+
+
+def test_run_batch_writes_the_guide(tmp_path, fake_server, response_cache):
+    output = str(tmp_path / 'out.jsonl')
+    docx_dir = tmp_path / 'guides'
+    assert run_batch(load_specs(tmp_path, [spec('smith family')]), output, str(docx_dir)) == 0
+    record = read_records(output)[0]
+    assert record['guide_path'] == str(docx_dir / 'smith_family.docx')
+    assert [path.name for path in docx_dir.iterdir()] == ['smith_family.docx']
@@ -0,0 +1,36 @@
+from chat_context import compact_messages, count_message_tokens, new_summary_state
+
+
+def message(role, words):
+    return {'role': role, 'content': ' '.join(['word'] * words)}
+
+
+def test_compact_messages_keeps_everything_under_budget():
+    messages = [message('system', 10), message('assistant', 10), message('user', 10)]
+    state = new_summary_state(messages)
+    calls = []
+    assert compact_messages(messages, state, lambda *args: calls.append(args) or 'summary', budget=6000) == messages
+    assert calls == []
+
+
+def test_compact_messages_folds_only_new_turns_into_the_summary():
+    messages = [message('system', 10)] + [message('user' if i % 2 else 'assistant', 200) for i in range(20)]
+    state = new_summary_state(messages)
+    calls = []
+
+    def summarize(previous, new_messages):
+        calls.append((previous, len(new_messages)))
+        return f"summary {len(calls)}"
+
+    budget = 2000
+    compacted = compact_messages(messages, state, summarize, budget=budget)
+    assert len(calls) == 1 and calls[0][0] == ''
+    assert compacted[0] == messages[0]
+    assert compacted[1]['content'].endswith('summary 1')
+    assert compacted[-1] == messages[-1]
+    assert count_message_tokens(compacted) <= budget
+
+    # The next turn fits next to the existing summary, nothing is summarized again
+    messages.append(message('user', 20))
+    compact_messages(messages, state, summarize, budget=budget)
+    assert len(calls) == 1
@@ -0,0 +1,65 @@
+import io
+import time
+
+import pytest
+from docx import Document
+
+from guide import GuideBuilder, generate_chapters, parse_toc
+
+
+def test_parse_toc_uses_indentation_for_letters_and_roman_numerals():
+    text = "1. Introduction\n   A. History\n   B. Culture\n   C. Language\n   D. Food\n2. Thailand\n   I. Bangkok"
+    assert parse_toc(text) == [
+        (1, 'Introduction'), (2, 'History'), (2, 'Culture'), (2, 'Language'), (2, 'Food'), (1, 'Thailand'), (2, 'Bangkok')
+    ]
+
+
+def test_parse_toc_tells_roman_numerals_from_letters_without_indentation():
+    text = "Table of Contents\nI. Introduction\nA. History\nB. Culture\nC. Food\nII. Thailand\nA. Bangkok\nIII. Laos\nIV. Tips\nV. Appendix"
+    assert parse_toc(text) == [
+        (1, 'Introduction'), (2, 'History'), (2, 'Culture'), (2, 'Food'), (1, 'Thailand'), (2, 'Bangkok'),
+        (1, 'Laos'), (1, 'Tips'), (1, 'Appendix')
+    ]
+
+
+def test_parse_toc_letters_continue_past_roman_looking_markers():
+    assert parse_toc("A. One\n- x\nH. Two\n- y\nI. Three") == [(1, 'One'), (2, 'x'), (1, 'Two'), (2, 'y'), (1, 'Three')]
+
+
+def test_parse_toc_numbers_in_titles_and_dotted_numbers():
+    text = "1. Intro\n2. 2024 Festivals\n3) Food\n3.1 Street food\n3.2. Markets\n4. End"
+    assert parse_toc(text) == [(1, 'Intro'), (1, '2024 Festivals'), (1, 'Food'), (2, 'Street food'), (2, 'Markets'), (1, 'End')]
+
+
+def test_parse_toc_markdown_headings_and_bullets():
+    text = "## Thailand\n### Bangkok\n- Temples\n- Markets\n## Laos"
+    assert parse_toc(text) == [(1, 'Thailand'), (2, 'Bangkok'), (3, 'Temples'), (3, 'Markets'), (1, 'Laos')]
+
+
+def test_generate_chapters_keeps_title_order_and_reports_progress():
+    progress = []
+
+    def write(title):
+        # Later chapters finish first
+        time.sleep(0.01 * (3 - int(title[-1])))
+        return f"text of {title}"
+
+    chapters = generate_chapters(['c1', 'c2', 'c3'], write, max_concurrency=3,
+                                 on_progress=lambda done, total: progress.append((done, total)))
+    assert chapters == ['text of c1', 'text of c2', 'text of c3']
+    assert progress == [(1, 3), (2, 3), (3, 3)]
+
+
+def test_guide_builder_writes_chapters_in_order_to_the_output():
+    builder = GuideBuilder([(1, 'Thailand'), (2, 'Bangkok'), (1, 'Laos')])
+    builder.add_chapter(2, 'Laos text')
+    builder.add_chapter(1, 'Bangkok text')
+    with pytest.raises(ValueError):
+        builder.save(io.BytesIO())
+    builder.add_chapter(0, 'Thailand text')
+    output = io.BytesIO()
+    builder.save(output)
+    output.seek(0)
+    paragraphs = [(p.style.name, p.text) for p in Document(output).paragraphs]
+    assert paragraphs == [('Heading 1', 'Thailand'), ('Normal', 'Thailand text'), ('Heading 2', 'Bangkok'),
+                          ('Normal', 'Bangkok text'), ('Heading 1', 'Laos'), ('Normal', 'Laos text')]
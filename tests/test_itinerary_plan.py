@@ -0,0 +1,60 @@
+import json
+
+import itinerary_plan
+from itinerary_plan import missing_days_instructions, reconcile_plan, regenerate_days
+
+
+def make_plan(countries, day_countries):
+    days = [{'day': number, 'date': f"2024-01-{number:02d}", 'country': country, 'location': country,
+             'summary': '', 'activities': [], 'transport': []} for number, country in enumerate(day_countries, start=1)]
+    return {'start_date': '2024-01-01', 'end_date': f"2024-01-{len(days):02d}", 'countries': countries, 'days': days}
+
+
+def test_reconcile_plan_marks_new_dates_and_removed_countries():
+    plan = make_plan(['Thailand', 'Laos'], ['Thailand', 'Thailand', 'Laos', 'Laos'])
+    new_plan, affected = reconcile_plan(plan, ['Thailand'], '2024-01-02', '2024-01-06')
+    assert affected == [3, 4, 5]
+    assert [day['date'] for day in new_plan['days']] == ['2024-01-02', '2024-01-03', '2024-01-04', '2024-01-05']
+    assert new_plan['countries'] == ['Thailand'] and new_plan['end_date'] == '2024-01-06'
+
+
+def test_reconcile_plan_gives_added_countries_days_at_the_end():
+    plan = make_plan(['Thailand'], ['Thailand'] * 6)
+    new_plan, affected = reconcile_plan(plan, ['Thailand', 'Laos'], '2024-01-01', '2024-01-06')
+    assert affected == [4, 5, 6]
+    assert new_plan['countries'] == ['Thailand', 'Laos']
+
+
+def test_reconcile_plan_keeps_the_plan_when_the_end_date_is_before_the_start():
+    plan = make_plan(['Thailand'], ['Thailand'] * 3)
+    assert reconcile_plan(plan, ['Laos'], '2024-01-05', '2024-01-01') == (plan, [])
+
+
+def test_reconcile_plan_marks_days_again_when_an_added_country_is_still_not_visited():
+    plan, _ = reconcile_plan(make_plan(['Thailand'], ['Thailand'] * 6), ['Thailand', 'Laos'], '2024-01-01', '2024-01-06')
+    assert plan['unplanned_countries'] == ['Laos']
+    # The regenerated days stayed in Thailand
+    assert reconcile_plan(plan, ['Thailand', 'Laos'], '2024-01-01', '2024-01-06')[1] == [4, 5, 6]
+    # A country the generated plan left out on its own is not asked for
+    plan = make_plan(['Thailand', 'Laos'], ['Thailand'] * 6)
+    assert reconcile_plan(plan, ['Thailand', 'Laos'], '2024-01-01', '2024-01-06')[1] == []
+
+
+def test_regenerating_affected_days_asks_for_the_missing_countries(monkeypatch):
+    requests = []
+
+    def answer(site, messages, model=None, with_model=False):
+        requests.append(messages[-1]['content'])
+        days = [{'day': number, 'country': 'Laos', 'location': 'Luang Prabang', 'summary': '', 'activities': [],
+                 'transport': [{'from': 'Thailand', 'to': 'Luang Prabang', 'mode': 'bus', 'hours': 8}] if number == 4 else []}
+                for number in (4, 5, 6)]
+        return json.dumps({'days': days}), model
+
+    monkeypatch.setattr(itinerary_plan, 'routed_completion', answer)
+    plan, affected = reconcile_plan(make_plan(['Thailand'], ['Thailand'] * 6), ['Thailand', 'Laos'], '2024-01-01', '2024-01-06')
+    instructions = missing_days_instructions(plan)
+    assert 'Laos' in instructions
+    plan = regenerate_days(plan, affected, instructions, [], 'gpt-4', use_cache=False)
+    assert 'Requested changes: ' + instructions in requests[0]
+    assert reconcile_plan(plan, ['Thailand', 'Laos'], '2024-01-01', '2024-01-06')[1] == []
+    assert missing_days_instructions(plan) is None
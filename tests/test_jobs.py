@@ -0,0 +1,99 @@
+import threading
+import time
+
+import pytest
+
+import jobs
+from jobs import JobQueue, make_job_key
+
+
+@pytest.fixture
+def files_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, 'JOB_FILES_DIR', str(tmp_path / 'files'))
+    return tmp_path / 'files'
+
+
+def wait_for(queue, job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while queue.get(job_id)['status'] in jobs.ACTIVE_STATUSES:
+        assert time.monotonic() < deadline, f"job {job_id} did not finish"
+        time.sleep(0.01)
+    return queue.get(job_id)
+
+
+def test_make_job_key_depends_on_session_kind_and_payload():
+    key = make_job_key('s1', 'guide', {'a': 1, 'b': 2})
+    assert key == make_job_key('s1', 'guide', {'b': 2, 'a': 1})
+    assert key != make_job_key('s2', 'guide', {'a': 1, 'b': 2})
+    assert key != make_job_key('s1', 'itinerary', {'a': 1, 'b': 2})
+
+
+def test_identical_jobs_are_reused_only_within_a_session_while_active(tmp_path, files_dir):
+    queue = JobQueue(str(tmp_path / 'jobs.sqlite3'), workers=2)
+    release = threading.Event()
+    calls = []
+
+    def run(reporter):
+        calls.append(reporter.job_id)
+        release.wait(5)
+        return 'done'
+
+    first = queue.submit('s1', 'itinerary', {'x': 1}, run)
+    assert queue.submit('s1', 'itinerary', {'x': 1}, run) == first
+    other = queue.submit('s2', 'itinerary', {'x': 1}, run)
+    assert other != first
+    release.set()
+    assert wait_for(queue, first)['status'] == 'done' and wait_for(queue, other)['status'] == 'done'
+    assert sorted(calls) == sorted([first, other])
+
+    # A finished job is not reused, the same request runs again
+    assert queue.submit('s1', 'itinerary', {'x': 1}, run) != first
+    assert [job['job_id'] for job in queue.list_jobs('s2')] == [other]
+
+
+def test_results_text_files_and_failures(tmp_path, files_dir):
+    queue = JobQueue(str(tmp_path / 'jobs.sqlite3'))
+
+    def write_file(reporter):
+        with open(reporter.result_file(), 'wb') as f:
+            f.write(b'docx')
+
+    def fail(reporter):
+        with open(reporter.result_file(), 'wb') as f:
+            f.write(b'half')
+        raise RuntimeError("model down")
+
+    text = queue.submit('s', 'itinerary', {}, lambda reporter: 'plan')
+    binary = queue.submit('s', 'guide', {}, write_file)
+    failed = queue.submit('s', 'guide', {'again': True}, fail)
+    assert 'result' not in wait_for(queue, text)
+    assert queue.get_result(text) == 'plan'
+    assert wait_for(queue, binary)['status'] == 'done' and queue.get_result(binary) == b'docx'
+    assert wait_for(queue, failed)['error'] == 'model down'
+    assert queue.get_result(failed) is None
+    assert [path.name for path in files_dir.iterdir()] == [binary]
+    assert queue.get(text, session_id='other') is None
+
+
+def test_expired_jobs_and_their_files_are_deleted(tmp_path, files_dir, monkeypatch):
+    queue = JobQueue(str(tmp_path / 'jobs.sqlite3'))
+    old = queue.submit('s', 'guide', {}, lambda reporter: open(reporter.result_file(), 'wb').close())
+    wait_for(queue, old)
+    monkeypatch.setattr(jobs, 'JOB_RETENTION_SECONDS', -1)
+    queue.submit('s', 'itinerary', {}, lambda reporter: 'plan')
+    assert queue.get(old) is None
+    assert list(files_dir.iterdir()) == []
+
+
+def test_jobs_left_active_by_a_previous_process_are_marked_failed(tmp_path, files_dir):
+    path = str(tmp_path / 'jobs.sqlite3')
+    queue = JobQueue(path)
+    release = threading.Event()
+    job_id = queue.submit('s', 'itinerary', {}, lambda reporter: release.wait(5) and 'plan')
+    try:
+        restarted = JobQueue(path)
+        job = restarted.get(job_id)
+        assert (job['status'], job['error']) == ('failed', 'Interrupted by a restart')
+        assert restarted.list_jobs('s')[0]['job_id'] == job_id
+    finally:
+        release.set()
@@ -0,0 +1,63 @@
+import llm_cache
+from llm_cache import LLM_CACHE_STALE_SECONDS, ResponseCache, cache_stream, make_cache_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(tmp_path, monkeypatch, **settings):
+    clock = Clock()
+    monkeypatch.setattr(llm_cache.time, 'time', clock)
+    return ResponseCache(str(tmp_path / 'cache.sqlite3'), **settings), clock
+
+
+def test_make_cache_key_depends_on_model_messages_and_params():
+    messages = [{'role': 'user', 'content': 'hi'}]
+    key = make_cache_key('gpt-4', messages, temperature=0)
+    assert key == make_cache_key('gpt-4', [{'content': 'hi', 'role': 'user'}], temperature=0)
+    assert key != make_cache_key('gpt-3.5-turbo', messages, temperature=0)
+    assert key != make_cache_key('gpt-4', messages, temperature=1)
+
+
+def test_expired_answers_are_misses_but_still_served_as_stale(tmp_path, monkeypatch):
+    cache, clock = make_cache(tmp_path, monkeypatch, ttl_seconds=60)
+    cache.set('a', 'answer')
+    clock.now += 30
+    assert cache.get('a') == 'answer'
+    clock.now += 60
+    assert cache.get('a') is None
+    assert cache.get_stale('a') == 'answer'
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # Past the stale window the entry is dropped on the next write
+    clock.now += LLM_CACHE_STALE_SECONDS
+    cache.set('b', 'other')
+    assert cache.get_stale('a') is None
+
+
+def test_least_recently_used_answers_are_evicted_above_the_size_limit(tmp_path, monkeypatch):
+    cache, clock = make_cache(tmp_path, monkeypatch, max_bytes=10)
+    cache.set('a', 'aaaa')
+    clock.now += 1
+    cache.set('b', 'bbbb')
+    clock.now += 1
+    assert cache.get('a') == 'aaaa'
+    clock.now += 1
+    cache.set('c', 'cccc')
+    assert cache.get_stale('b') is None
+    assert cache.get('a') == 'aaaa' and cache.get('c') == 'cccc'
+    assert cache.stats()['bytes'] == 8
+
+
+def test_cache_stream_stores_the_answer_once_the_stream_ends(tmp_path, monkeypatch):
+    cache, _ = make_cache(tmp_path, monkeypatch)
+    stream = cache_stream(cache, 'key', iter(['one ', 'two']))
+    assert next(stream) == 'one '
+    assert cache.get_stale('key') is None
+    assert list(stream) == ['two']
+    assert cache.get('key') == 'one two'
@@ -0,0 +1,27 @@
+from participants import MAX_PARTICIPANTS, apply_participant_changes, read_participants_csv, validate_participant
+
+
+def test_read_participants_csv_accepts_header_variants_and_reports_lines():
+    text = "\ufeffName,Age,Gender,Vacation Preference,Notes\nAnn,34,female,relax,vegan\nBob,x,,,\n,,,,\nCid,,,,\n"
+    participants, errors = read_participants_csv(text)
+    assert [(p.name, p.age, p.gender, p.preference, p.additional_preferences) for p in participants] == [
+        ('Ann', 34, 'Female', 'Relax', 'vegan'), ('Cid', 30, 'Other', 'Culture', '')
+    ]
+    assert errors == ["line 3: age must be a number, not 'x'"]
+
+
+def test_read_participants_csv_needs_a_name_column():
+    assert read_participants_csv("age,gender\n30,Male\n") == ([], ["the file needs a 'name' column"])
+
+
+def test_apply_participant_changes_keeps_rows_that_fail_validation():
+    participants = [validate_participant({'name': 'Ann', 'age': 34}), validate_participant({'name': 'Bob'})]
+    edited = {'0': {'age': 35}, '1': {'age': 200}}
+    added = [{'name': 'Cid', 'gender': 'male'}, {'name': None, 'age': None}, {'age': 20}]
+    result, errors = apply_participant_changes(participants, edited, added, [])
+    assert [(p.name, p.age, p.gender) for p in result] == [('Ann', 35, 'Other'), ('Bob', 30, 'Other'), ('Cid', 30, 'Male')]
+    assert errors == ["Participant 2: age must be between 0 and 120", "New row 3: a name is required"]
+
+    result, errors = apply_participant_changes(result, {}, [{'name': f"P{i}"} for i in range(MAX_PARTICIPANTS)], [1])
+    assert len(result) == MAX_PARTICIPANTS and result[1].name == 'Cid'
+    assert errors == [f"Only the first {MAX_PARTICIPANTS} participants are kept"]
@@ -0,0 +1,69 @@
+import time
+
+import pytest
+from openai import APITimeoutError, InternalServerError
+
+import routing
+from generation import generate_content_with_gpt4, generate_itinerary
+from llm_cache import make_cache_key
+from routing import FAST_MODEL, STRONG_MODEL, get_route, routed_completion
+
+MESSAGES = [{'role': 'user', 'content': 'Plan a trip'}]
+
+
+def set_route(monkeypatch, site, **changes):
+    monkeypatch.setitem(routing.ROUTE_POLICIES, site, dict(routing.ROUTE_POLICIES[site], **changes))
+
+
+def test_get_route_puts_the_chosen_model_first():
+    assert get_route('itinerary', model=FAST_MODEL)['models'] == [FAST_MODEL]
+    assert get_route('itinerary')['models'] == [STRONG_MODEL, FAST_MODEL]
+
+
+def test_routed_completion_falls_back_to_the_next_tier(fake_server):
+    fake_server.config['failing_models'] = {STRONG_MODEL}
+    text, model = routed_completion('chapter', MESSAGES, with_model=True)
+    assert text.startswith('word0') and model == FAST_MODEL
+    # The strong model was retried before falling back
+    assert fake_server.calls == {STRONG_MODEL: 3, FAST_MODEL: 1}
+    assert routed_completion('chapter', MESSAGES) == text
+
+
+def test_routed_completion_raises_the_last_error_when_every_tier_fails(fake_server):
+    fake_server.config['failing_models'] = {STRONG_MODEL, FAST_MODEL}
+    with pytest.raises(InternalServerError):
+        routed_completion('toc', MESSAGES)
+
+
+def test_each_tier_gets_one_latency_budget(fake_server, monkeypatch):
+    fake_server.config['latency'] = 1.0
+    set_route(monkeypatch, 'itinerary', budget_seconds=0.3, retries=2)
+    start = time.perf_counter()
+    with pytest.raises(APITimeoutError):
+        routed_completion('itinerary', MESSAGES)
+    # A timed out attempt is not retried, each tier is left once its budget is spent
+    assert time.perf_counter() - start < 1.0
+    assert fake_server.calls == {STRONG_MODEL: 1, FAST_MODEL: 1}
+
+
+def test_fallback_answers_are_cached_under_the_model_that_gave_them(fake_server, response_cache):
+    fake_server.config['failing_models'] = {STRONG_MODEL}
+    answer = generate_content_with_gpt4('You write guides', 'Chapter about Laos')
+    messages = [{'role': 'assistant', 'content': 'You write guides'}, {'role': 'user', 'content': 'Chapter about Laos'}]
+    params = get_route('chapter')['params']
+    assert response_cache.get(make_cache_key(FAST_MODEL, messages, **params)) == answer
+    assert response_cache.get(make_cache_key(STRONG_MODEL, messages, **params)) is None
+
+    # Once the strong model is back it answers instead of the cached fallback
+    fake_server.config['failing_models'] = set()
+    generate_content_with_gpt4('You write guides', 'Chapter about Laos')
+    assert response_cache.get(make_cache_key(STRONG_MODEL, messages, **params)) is not None
+
+
+def test_stale_answers_are_used_when_every_model_fails(fake_server, response_cache, monkeypatch):
+    fresh = generate_itinerary(MESSAGES, STRONG_MODEL, ['Thailand'])
+    monkeypatch.setattr(response_cache, 'ttl_seconds', -1)
+    fake_server.config['failing_models'] = {STRONG_MODEL, FAST_MODEL}
+    assert generate_itinerary(MESSAGES, STRONG_MODEL, ['Thailand']) == fresh
+    with pytest.raises(InternalServerError):
+        generate_itinerary(MESSAGES, STRONG_MODEL, ['Laos', 'Vietnam'])
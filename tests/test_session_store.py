@@ -0,0 +1,86 @@
+import datetime
+import time
+
+import session_store
+from session_store import (MemorySessionStore, Message, Participant, SessionData, SessionManager, SQLiteSessionStore,
+                           dump_session, load_session)
+
+
+def make_session():
+    return SessionData(
+        start_date=datetime.date(2024, 2, 1), end_date=datetime.date(2024, 2, 10), selected_countries=['Japan'],
+        num_people=2, participants=[Participant('Ann', 34, 'Female', 'Culture', 'vegan')],
+        messages=[Message('system', 'context'), Message('assistant', 'Costs $50')],
+        chat_summary={'summary': 'likes temples', 'folded': 1},
+        itinerary_plan={'days': [{'day': 1}]}, itinerary_plan_job='job1'
+    )
+
+
+def test_dump_and_load_session_round_trip():
+    session = make_session()
+    assert load_session(dump_session(session)) == session
+
+
+def test_load_session_ignores_unknown_keys_and_fills_missing_ones():
+    import json
+    import zlib
+    blob = zlib.compress(json.dumps({'num_people': 3, 'added_later': True}).encode('utf-8'))
+    session = load_session(blob)
+    assert session.num_people == 3 and session.participants == [] and session.gpt_version == SessionData().gpt_version
+
+
+def test_sqlite_store_save_load_prune(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / 'sessions.sqlite3'))
+    store.save('a', b'one')
+    store.save('b', b'two')
+    assert store.load('a') == b'one' and store.load('missing') is None
+    store.prune(time.time() + 1)
+    assert store.count() == 0
+    store.save('a', b'one')
+    store.delete('a')
+    assert store.load('a') is None
+
+
+def test_idle_sessions_are_moved_to_the_store_and_loaded_back(monkeypatch):
+    monkeypatch.setattr(session_store, 'SESSION_SWEEP_SECONDS', 0)
+    store = MemorySessionStore()
+    manager = SessionManager(store, idle_seconds=0, max_live=10)
+    session = manager.get('a')
+    session.selected_countries.append('Vietnam')
+    # Fetching another session sweeps the idle one out, the one being fetched is kept
+    manager.get('b')
+    assert manager.stats() == {'live': 1, 'stored': 1, 'loads': 0, 'evictions': 1}
+    restored = manager.get('a')
+    assert restored is not session and restored.selected_countries == ['Thailand', 'Laos', 'Vietnam']
+    assert manager.loads == 1
+
+
+def test_least_recently_used_sessions_are_evicted_above_max_live():
+    manager = SessionManager(MemorySessionStore(), idle_seconds=3600, max_live=2)
+    for session_id in ('a', 'b', 'c'):
+        manager.get(session_id)
+    assert manager.stats()['live'] == 2
+    assert manager.store.load('a') is not None and manager.store.load('c') is None
+
+
+def test_save_skips_unchanged_sessions():
+    saved = []
+
+    class CountingStore(MemorySessionStore):
+        def save(self, session_id, blob):
+            saved.append(session_id)
+            super().save(session_id, blob)
+
+    manager = SessionManager(CountingStore())
+    session = manager.get('a')
+    manager.save('a', session)
+    manager.save('a', session)
+    session.num_people = 4
+    manager.save('a', session)
+    assert saved == ['a', 'a']
+
+
+def test_session_lock_is_shared_by_runs_of_the_same_session():
+    manager = SessionManager(MemorySessionStore())
+    assert manager.lock('a') is manager.lock('a')
+    assert manager.lock('a') is not manager.lock('b')
@@ -0,0 +1,79 @@
+import streamlit as st
+
+from chat_context import CHAT_SUMMARY_MAX_TOKENS, compact_messages, new_summary_state
+from chat_view import render_chat_history, render_message, render_stream
+from generation import build_chat_prompt, build_travel_context
+from routing import routed_completion
+from session_store import Message, message_dicts
+from views.common import get_session, use_streaming
+
+# Page 3: Dynamic Chatbot for Travel Planning
+def page3():
+    st.title("💬 Dynamic Travel Planning Chatbot")
+
+    # Initialize chatbot with specific context-based questions
+    session = get_session()
+    if not session.messages:
+        travel_context = generate_travel_context()
+        initialize_chat_with_context(travel_context)
+        
+    # Display chatbot messages
+    display_chatbot_messages()
+
+    # Ask the opening question once the context prompt is in place
+    if session.messages[-1].role == "system":
+        generate_next_question()
+
+    # User input for chatbot
+    handle_user_input()
+
+# Function to generate the travel context for the chatbot
+def generate_travel_context():
+    session = get_session()
+    return build_travel_context(session.start_date, session.end_date, session.selected_countries, session.participants)
+    
+# Function to initialize chatbot with travel context
+def initialize_chat_with_context(travel_context):
+    context_prompt = build_chat_prompt(travel_context)
+    session = get_session()
+    session.messages = [Message("system", context_prompt)]
+    session.chat_summary = new_summary_state(session.messages)
+
+# Function to fold older chat turns into the running summary (only the newly folded turns are sent)
+def summarize_conversation(previous_summary, new_messages):
+    transcript = "\n".join([f"{msg['role']}: {msg['content']}" for msg in new_messages])
+    prompt = "You keep a running summary of a conversation between a travel agent and traveller(s). " \
+             "Update the summary with the new part of the conversation. Keep every preference, constraint and decision, drop small talk.\n\n" \
+             f"Current summary:\n{previous_summary or '(empty)'}\n\nNew part of the conversation:\n{transcript}"
+    summary = routed_completion("summary", [{"role": "user", "content": prompt}], max_tokens=CHAT_SUMMARY_MAX_TOKENS)
+    return summary.strip()
+
+# Function to get the chat messages to send to the model, compacted to the token budget
+def get_chat_context():
+    session = get_session()
+    if session.chat_summary is None:
+        session.chat_summary = new_summary_state(session.messages)
+    return message_dicts(compact_messages(session.messages, session.chat_summary, summarize_conversation))
+
+# Function to display chatbot messages (only the latest page, older ones on request)
+def display_chatbot_messages():
+    render_chat_history(get_session().messages)
+
+# Function to handle user input and generate next question
+def handle_user_input():
+    if prompt := st.chat_input():
+        # Append user input to messages and write it immediately
+        get_session().messages.append(Message("user", prompt))
+        render_message("user", prompt)
+
+        # Generate next question (chatbot response), it is written as it arrives
+        generate_next_question()
+
+# Function to generate next question after user input and write it in the chat (short questions use the fast model tier)
+def generate_next_question():
+    if use_streaming():
+        next_question = render_stream("assistant", routed_completion("chat", get_chat_context(), stream=True))
+    else:
+        next_question = routed_completion("chat", get_chat_context())
+        render_message("assistant", next_question)
+    get_session().messages.append(Message("assistant", next_question))
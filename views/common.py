@@ -0,0 +1,68 @@
+import uuid
+
+import streamlit as st
+
+from jobs import ACTIVE_STATUSES, JOB_POLL_SECONDS, get_job_queue
+from session_store import SESSION_RESUME_FROM_URL, get_session_manager
+
+
+# Helper function to get this session's trip details, participants and chat. They are kept in the session
+# store rather than st.session_state, so look the session up on every run instead of holding on to it
+def get_session():
+    return get_session_manager().get(get_session_id())
+
+# Helper function to write the session's changes to the store, so they survive a restart
+def save_session():
+    get_session_manager().save(get_session_id(), get_session())
+
+# Helper function to check whether answers should be streamed as they are generated
+def use_streaming():
+    return get_session().stream_responses
+
+# Helper function to get the model chosen for the final itinerary (the chat itself uses the fast tier)
+def get_chatbot_model():
+    return "gpt-3.5-turbo" if get_session().gpt_version == '3.5' else "gpt-4"
+
+# Helper function to get an id for this browser session. It is kept in the URL so the session and its jobs can
+# be resumed after a reload, unless SESSION_RESUME_FROM_URL is off: whoever has the URL has the session
+def get_session_id():
+    if 'session_id' not in st.session_state:
+        resumed = st.query_params.get('session') if SESSION_RESUME_FROM_URL else None
+        st.session_state['session_id'] = resumed or uuid.uuid4().hex
+        if SESSION_RESUME_FROM_URL:
+            st.query_params['session'] = st.session_state['session_id']
+    return st.session_state['session_id']
+
+# Helper function to get the lock that serializes the script runs of this session (tabs sharing its URL)
+def session_lock():
+    return get_session_manager().lock(get_session_id())
+
+# Helper function to get the latest job of a kind for this session, looked up again after a reload
+def get_session_job(kind):
+    key = f"{kind}_job"
+    if key not in st.session_state:
+        jobs = [job for job in get_job_queue().list_jobs(get_session_id()) if job['kind'] == kind]
+        st.session_state[key] = jobs[0]['job_id'] if jobs else None
+    if st.session_state[key] is None:
+        return None
+    return get_job_queue().get(st.session_state[key])
+
+# Function to show a job: polled while it is running, rendered in full once it is finished
+def show_job(kind, render):
+    job = get_session_job(kind)
+    if job is None:
+        return
+    if job['status'] in ACTIVE_STATUSES:
+        poll_job(kind, render)
+    elif job['status'] == 'done':
+        render(job)
+    else:
+        st.error(f"Generation failed: {job['error']}")
+
+# Function to refresh a running job on its own, the whole page reruns once the job is finished
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def poll_job(kind, render):
+    job = get_session_job(kind)
+    if job is None or job['status'] not in ACTIVE_STATUSES:
+        st.rerun()
+    render(job)
@@ -0,0 +1,26 @@
+import streamlit as st
+
+from llm_cache import get_response_cache
+from metrics import prometheus_text, summarize_llm_calls, summarize_page_renders
+from session_store import get_session_manager
+
+# Hidden diagnostics page (open the app with ?diagnostics=1): model call latency, tokens and page render times
+def page_diagnostics():
+    st.title("🩺 Diagnostics")
+
+    st.subheader("Model calls")
+    st.dataframe(summarize_llm_calls())
+
+    st.subheader("Page renders (seconds)")
+    st.dataframe(summarize_page_renders())
+
+    cache = get_response_cache()
+    if cache:
+        st.subheader("Response cache")
+        st.json(cache.stats())
+
+    st.subheader("Sessions")
+    st.json(get_session_manager().stats())
+
+    with st.expander("Prometheus metrics"):
+        st.code(prometheus_text(), language="text")
@@ -0,0 +1,135 @@
+import json
+
+import streamlit as st
+
+from chat_view import message_markdown
+from generation import generate_itinerary
+from itinerary_plan import (generate_plan, missing_days_instructions, plan_markdown, reconcile_plan, regenerate_days,
+                            trip_dates)
+from jobs import ACTIVE_STATUSES, get_job_queue
+from views.chat import get_chat_context
+from views.common import get_chatbot_model, get_session, get_session_id, get_session_job, show_job, use_streaming
+
+# Page 4: Final Trip Overview
+def page4():
+    st.title("🌍 Final Trip Overview")
+
+    # A structured plan (days, places, transport) can later be changed one day at a time
+    # The widget's state is dropped while another page is shown, the choice is kept apart and seeded back
+    if 'structured_itinerary' not in st.session_state:
+        st.session_state['structured_itinerary'] = st.session_state.get('structured_itinerary_choice', False)
+    structured = st.sidebar.checkbox("Day by day plan (edit single days)", key='structured_itinerary')
+    st.session_state['structured_itinerary_choice'] = structured
+
+    # Same conversation gives back the cached itinerary unless a fresh one is requested
+    fresh = st.sidebar.checkbox("Generate a fresh itinerary (skip cache)")
+
+    # Button to generate itinerary, the generation runs as a background job that survives reruns and navigation
+    if st.sidebar.button("Generate Itinerary"):
+        messages = get_chat_context()
+        model = get_chatbot_model()
+        session = get_session()
+        countries = list(session.selected_countries)
+        stream = use_streaming()
+        use_cache = not fresh
+        if structured:
+            submit_plan_job("generate", {"messages": messages, "model": model, "countries": countries, "use_cache": use_cache,
+                                         "start_date": session.start_date, "end_date": session.end_date})
+        else:
+            payload = {"messages": messages, "model": model, "countries": countries, "use_cache": use_cache}
+            st.session_state['itinerary_job'] = get_job_queue().submit(
+                get_session_id(), "itinerary", payload,
+                lambda reporter: run_itinerary_job(reporter, messages, model, countries, use_cache, stream)
+            )
+
+    if structured:
+        show_plan(fresh)
+    else:
+        show_job("itinerary", render_itinerary_job)
+
+# Function to show the itinerary job: the text generated so far while it runs, the full plan once done
+def render_itinerary_job(job):
+    st.subheader("Your Customized Travel Plan:")
+    if job['status'] == 'done':
+        st.write(get_job_queue().get_result(job['job_id']))
+    else:
+        st.write(job['partial'] or "Planning your trip...")
+
+# Function to run the itinerary generation in a job worker, streamed text is published as it arrives
+def run_itinerary_job(reporter, messages, model, countries, use_cache, stream):
+    if not stream:
+        return generate_itinerary_from_conversation(messages, use_cache=use_cache, model=model, countries=countries)
+    itinerary = ""
+    for chunk in generate_itinerary_from_conversation(messages, stream=True, use_cache=use_cache, model=model, countries=countries):
+        itinerary += chunk
+        reporter.partial(itinerary)
+    return itinerary
+
+# Function to generate the itinerary, returns a generator of text chunks when stream is True.
+# model and countries default to the session's settings, pass them when running outside the script thread
+def generate_itinerary_from_conversation(messages, stream=False, use_cache=True, model=None, countries=None):
+    if countries is None:
+        countries = get_session().selected_countries
+    return generate_itinerary(messages, model or get_chatbot_model(), countries, stream=stream, use_cache=use_cache)
+
+# Function to submit a plan job: "generate" writes the whole plan, "regenerate" rewrites some days of the current one
+def submit_plan_job(action, payload):
+    if action == "generate":
+        def run(reporter):
+            return json.dumps(generate_plan(payload['messages'], payload['model'], payload['countries'], payload['start_date'],
+                                            payload['end_date'], use_cache=payload['use_cache']))
+    else:
+        def run(reporter):
+            return json.dumps(regenerate_days(payload['plan'], payload['days'], payload['instructions'], payload['messages'],
+                                              payload['model'], use_cache=payload['use_cache']))
+    st.session_state['plan_job'] = get_job_queue().submit(get_session_id(), "plan", dict(payload, action=action), run)
+
+# Function to keep the result of a finished plan job as the session's plan, each job is loaded once
+# so later edits are not overwritten by the job that created the plan
+def load_plan_job(job):
+    if job['status'] != 'done':
+        st.write("Planning your trip...")
+    else:
+        session = get_session()
+        if session.itinerary_plan_job != job['job_id']:
+            session.itinerary_plan_job = job['job_id']
+            session.itinerary_plan = json.loads(get_job_queue().get_result(job['job_id']))
+
+# Function to show the structured plan with the controls to change some of its days
+def show_plan(fresh):
+    show_job("plan", load_plan_job)
+    job = get_session_job("plan")
+    session = get_session()
+    plan = session.itinerary_plan
+    if plan is None or (job and job['status'] in ACTIVE_STATUSES):
+        return
+
+    use_cache = not fresh
+
+    # Dates or countries changed on page 1: only new days, days in removed countries and a share of the days
+    # for added countries are planned again
+    if not trip_dates(session.start_date, session.end_date):
+        st.warning("The end date is before the start date, the plan keeps its previous dates until this is fixed on Page 1.")
+    plan, affected = reconcile_plan(plan, session.selected_countries, session.start_date, session.end_date)
+    if affected:
+        st.info(f"The trip details changed, {len(affected)} day(s) have to be planned again.")
+        if st.button("Update affected days"):
+            submit_plan_job("regenerate", {"plan": plan, "days": affected, "instructions": missing_days_instructions(plan),
+                                           "messages": get_chat_context(), "model": get_chatbot_model(),
+                                           "use_cache": use_cache})
+            st.rerun()
+
+    st.subheader("Your Customized Travel Plan:")
+    st.markdown(message_markdown(plan_markdown(plan)))
+    st.download_button("Download plan (JSON)", data=json.dumps(plan, indent=2, ensure_ascii=False),
+                       file_name="travel_plan.json", mime="application/json")
+
+    # Changing some days only sends those days back to the model, the rest of the plan is kept
+    with st.form("change_days"):
+        labels = {day['day']: f"Day {day['day']} ({day['date']}): {day['location']}" for day in plan['days']}
+        days = st.multiselect("Days to change", list(labels), format_func=labels.get)
+        instructions = st.text_area("What should change?")
+        if st.form_submit_button("Regenerate selected days") and days:
+            submit_plan_job("regenerate", {"plan": plan, "days": days, "instructions": instructions, "messages": get_chat_context(),
+                                           "model": get_chatbot_model(), "use_cache": use_cache})
+            st.rerun()
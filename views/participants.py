@@ -0,0 +1,81 @@
+from dataclasses import asdict
+
+import streamlit as st
+
+from participants import (GENDERS, PARTICIPANT_DEFAULTS, PARTICIPANT_FIELDS, PREFERENCES,
+                          apply_participant_changes, limit_participants, read_participants_csv, validate_participant)
+from views.common import get_session
+
+# Page 2: Participant Details
+def page2():
+    st.title("👥 Participant Details")
+    session = get_session()
+
+    # The list is kept between runs, it only grows or shrinks to the number of people chosen on page 1
+    if len(session.participants) != session.num_people:
+        resize_participants(session)
+
+    # Every participant is one row of a single form, the changes are applied when the form is saved
+    version = st.session_state.get('participants_version', 0)
+    with st.form("participants"):
+        st.data_editor(
+            [asdict(p) for p in session.participants],
+            key=f"participants_editor_{version}",
+            num_rows="dynamic",
+            hide_index=True,
+            column_order=PARTICIPANT_FIELDS,
+            column_config={
+                'name': st.column_config.TextColumn("Name", required=True),
+                'age': st.column_config.NumberColumn("Age", min_value=0, max_value=120, step=1,
+                                                     default=PARTICIPANT_DEFAULTS['age']),
+                'gender': st.column_config.SelectboxColumn("Gender", options=GENDERS, default=PARTICIPANT_DEFAULTS['gender']),
+                'preference': st.column_config.SelectboxColumn("Vacation Preference", options=PREFERENCES,
+                                                               default=PARTICIPANT_DEFAULTS['preference']),
+                'additional_preferences': st.column_config.TextColumn("Additional Preferences", width="large")
+            }
+        )
+        st.form_submit_button("Save Participants", on_click=save_participant_changes, args=(f"participants_editor_{version}",))
+
+    # Large groups can be loaded from a spreadsheet export
+    with st.expander("Import participants from a CSV file"):
+        st.caption("Columns: name, age, gender, preference, additional_preferences. Only name is required.")
+        replace = st.radio("Imported participants", ("Replace the list", "Add to the list")) == "Replace the list"
+        st.file_uploader("CSV file", type="csv", key=f"participants_csv_{version}",
+                         on_change=import_participants, args=(f"participants_csv_{version}", replace))
+
+    for error in st.session_state.get('participant_errors', []):
+        st.warning(error)
+
+# Function to add default participants or drop the last ones so the list matches the number of people
+def resize_participants(session):
+    participants = session.participants[:session.num_people]
+    for i in range(len(participants), session.num_people):
+        participants.append(validate_participant(dict(PARTICIPANT_DEFAULTS, name=f"Participant {i + 1}")))
+    session.participants = participants
+
+# Function to store the participants and show the editor again from the stored list
+def set_participants(participants, errors):
+    session = get_session()
+    session.participants = participants
+    session.num_people = max(1, len(participants))
+    st.session_state['participant_errors'] = errors
+    # A new editor key drops the edits held by the old editor, they are now part of the list
+    st.session_state['participants_version'] = st.session_state.get('participants_version', 0) + 1
+
+# Function to apply the rows changed in the editor, the rows that were not touched are not validated again
+def save_participant_changes(editor_key):
+    changes = st.session_state[editor_key]
+    participants, errors = apply_participant_changes(
+        get_session().participants, changes['edited_rows'], changes['added_rows'], changes['deleted_rows']
+    )
+    set_participants(participants, errors)
+
+# Function to read the uploaded CSV file into the participant list
+def import_participants(uploader_key, replace):
+    uploaded = st.session_state[uploader_key]
+    if uploaded is None:
+        return
+    imported, errors = read_participants_csv(uploaded.getvalue().decode('utf-8', errors='replace'))
+    # A file without a single valid row does not wipe the current list
+    participants = imported if replace and imported else get_session().participants + imported
+    set_participants(*limit_participants(participants, errors))
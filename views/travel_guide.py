@@ -0,0 +1,36 @@
+import streamlit as st
+
+from generation import GUIDE_WRITER_PROMPT, build_guide_prompt, generate_travel_guide
+from jobs import get_job_queue
+from views.common import get_session, get_session_id, show_job
+
+# Page 5: Personalized Travel Guide Generator
+def page5():
+    st.title("📘 Personalized Travel Guide Generator")
+
+    session = get_session()
+    if session.selected_countries:
+        assistant_prompt = GUIDE_WRITER_PROMPT
+        user_prompt = build_guide_prompt(session.selected_countries, session.participants)
+
+        # The guide is generated as a background job, the page shows its progress and then the download
+        if st.button('Generate Guide'):
+            st.session_state['guide_job'] = get_job_queue().submit(
+                get_session_id(), "guide", {"assistant_prompt": assistant_prompt, "user_prompt": user_prompt},
+                lambda reporter: generate_travel_guide(assistant_prompt, user_prompt, reporter.result_file(),
+                                                       on_progress=reporter.progress)
+            )
+
+        show_job("guide", render_guide_job)
+    else:
+        st.write("Please complete the previous steps to generate your travel guide.")
+
+# Function to show the guide job: a progress bar while chapters are written, then the download button.
+# The .docx is only read from the job's file when the button is clicked, not on every rerun
+def render_guide_job(job):
+    if job['status'] == 'done':
+        job_id = job['job_id']
+        st.download_button("Download Travel Guide", data=lambda: get_job_queue().get_result(job_id),
+                           file_name="personalized_travel_guide.docx")
+    else:
+        st.progress(job['progress'], text=f"Writing chapters... {job['progress']:.0%}")
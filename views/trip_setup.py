@@ -0,0 +1,51 @@
+import streamlit as st
+
+from countries import load_country_names
+from views.common import get_session
+
+# Function to load countries data (precomputed list, cached per process)
+def load_countries():
+    return load_country_names()
+
+# Function to start a page 1 widget from the saved settings. Its state is dropped while another page is shown,
+# so it is seeded again when missing; otherwise the widget keeps its own value and no value= is passed, which
+# would make Streamlit treat every changed value as a new widget
+def seed_widget(key, value):
+    if key not in st.session_state:
+        st.session_state[key] = value
+
+# Page 1: Initial Setup
+def page1():
+    # Widgets start from the saved settings, so they are kept when coming back to the page or the app
+    session = get_session()
+    countries = load_countries()
+    seed_widget('gpt_version', session.gpt_version)
+    seed_widget('start_date', session.start_date)
+    seed_widget('end_date', session.end_date)
+    seed_widget('selected_countries', [c for c in session.selected_countries if c in countries])
+    seed_widget('num_people', session.num_people)
+    seed_widget('stream_responses', session.stream_responses)
+    with st.sidebar:
+        # GPT Selection (model of the final itinerary)
+        gpt_version = st.radio("Choose GPT Version", ('3.5', '4'), key='gpt_version')
+        
+        # Travel Dates
+        start_date = st.date_input("Start Date", key='start_date')
+        end_date = st.date_input("End Date", key='end_date')
+
+        # Country Selection
+        selected_countries = st.multiselect('Choose countries', countries, key='selected_countries')
+
+        # Number of People
+        num_people = st.number_input("Number of People", min_value=1, max_value=100, key='num_people')
+
+        # Show answers token by token while they are generated
+        stream_responses = st.checkbox("Stream responses", key='stream_responses')
+
+    # Save settings to the session
+    session.gpt_version = gpt_version
+    session.start_date = start_date
+    session.end_date = end_date
+    session.selected_countries = selected_countries
+    session.num_people = num_people
+    session.stream_responses = stream_responses